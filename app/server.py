@@ -1,18 +1,68 @@
+import asyncio
+import hashlib
 import os
+import re
+import shlex
+import signal
 import logging
 import subprocess
-import traceback
-from typing import Dict, List, Optional, Union
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
 import sys
 
-from fastmcp import FastMCP
-from pydantic import BaseModel, Field
+from pydantic import BaseModel
 
-from config.settings import WrapperConfig, load_config
-from utils.process import ApplicationRunner
+from config.settings import ApplicationConfig, WrapperConfig, load_config
+from utils.process import PROCESS_GROUP_KWARGS, ApplicationRunner, child_env
+
+if TYPE_CHECKING:
+    from fastmcp import FastMCP
 
 logger = logging.getLogger(__name__)
 
+# Relative working directories in the configuration are resolved against the project root
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Directory names checked, in order, for an application's virtual environment
+VENV_DIR_NAMES = ('venv', '.venv', 'env', '.env')
+
+# Bytes of stdout and of stderr kept per execution unless the application sets max_output_bytes
+DEFAULT_MAX_OUTPUT_BYTES = 16 * 1024 * 1024
+
+# Appended to captured output that went over the limit
+OUTPUT_TRUNCATED_MARKER = b"\n[output truncated]\n"
+
+# Number of execution results kept for applications marked pure
+RESULT_CACHE_SIZE = 256
+
+# Seconds to keep reading output after a timed-out application has been killed
+POST_KILL_DRAIN_TIMEOUT = 5
+
+# Options passed to every pip invocation to skip its self-update check and prompts
+PIP_COMMON_ARGS = ["--disable-pip-version-check", "--no-input"]
+
+# Number of requirements installed per pip call when retrying a failed install
+PIP_BATCH_SIZE = 20
+
+# First pip release with a usable lazy-wheel metadata fetcher (--use-feature=fast-deps)
+PIP_FAST_DEPS_MIN_VERSION = (21, 0)
+
+# From pip 23.1 every build runs in an isolated PEP 517 environment that fetches its own
+# setuptools and wheel, so a new venv with at least this pip doesn't need upgrading first
+PIP_BOOTSTRAP_MIN_VERSION = (23, 1)
+
+# A requirements.txt line without surrounding whitespace, blank and comment lines, or
+# anything after a '%' (a common copy-paste artifact pip rejects)
+_REQUIREMENT_LINE_RE = re.compile(r'^[^\S\n]*([^#%\s][^%\n]*?)[^\S\n]*(?:%.*)?$', re.MULTILINE)
+
+# A requirements.txt line that is not a comment but has a '%' in it
+_STRAY_PERCENT_RE = re.compile(r'^[^\S\n]*(?![#\s])[^\n]*%', re.MULTILINE)
+
+# File inside the venv holding the hash of the last requirements set installed into it
+REQUIREMENTS_HASH_FILE = '.reqs.sha256'
+
 
 class ApplicationStatus(BaseModel):
     """Status of an application."""
@@ -26,7 +76,8 @@ class ApplicationsList(BaseModel):
     applications: List[ApplicationStatus]
 
 
-class ApplicationExecutionResult(BaseModel):
+@dataclass(slots=True)
+class ApplicationExecutionResult:
     """Result of executing an application."""
     stdout: str
     stderr: str
@@ -34,6 +85,55 @@ class ApplicationExecutionResult(BaseModel):
     success: bool
 
 
+class EnvironmentSetupStatus(BaseModel):
+    """Outcome of preparing the virtual environment of a Python application."""
+    name: str
+    venv_path: Optional[str] = None
+    ready: bool = False
+    message: Optional[str] = None
+
+
+@dataclass(slots=True)
+class ResolvedApplication:
+    """Filesystem paths of an application, resolved once instead of on every tool call."""
+    working_dir: str
+    available: bool = False
+    venv_path: Optional[str] = None
+    python_exec: Optional[str] = None
+    pip_path: Optional[str] = None
+    command: List[str] = field(default_factory=list)  # Base command line, before per-call arguments
+
+
+def _log_exception(message: str):
+    """Log the exception being handled as an error, with its traceback only when debugging."""
+    logger.error(message, exc_info=logger.isEnabledFor(logging.DEBUG))
+
+
+def _find_venv(working_dir: str) -> Optional[str]:
+    """Find the virtual environment directory of an application, if it has one."""
+    # One directory listing instead of a stat per candidate name
+    try:
+        with os.scandir(working_dir) as entries:
+            dir_names = {entry.name for entry in entries if entry.is_dir()}
+    except OSError:
+        return None
+    
+    for venv_dir in VENV_DIR_NAMES:
+        if venv_dir in dir_names:
+            return os.path.join(working_dir, venv_dir)
+    return None
+
+
+def _venv_executable(venv_path: str, name: str) -> str:
+    """Get the path of an executable inside a virtual environment."""
+    if os.name == 'nt':  # Windows
+        exe_path = os.path.join(venv_path, 'Scripts', f'{name}.exe')
+        if not os.path.exists(exe_path):
+            exe_path = os.path.join(venv_path, 'Scripts', name)
+        return exe_path
+    return os.path.join(venv_path, 'bin', name)  # Unix/Linux/macOS
+
+
 class AppConfigManager:
     """Class to manage the MCP server with application configuration."""
     
@@ -43,68 +143,172 @@ class AppConfigManager:
             logger.info(f"Loading configuration from {config_path}")
             self.config = load_config(config_path)
             
+            # pip versions by pip executable, filled in lazily during environment setup
+            self._pip_versions: Dict[str, Tuple[int, ...]] = {}
+            
+            # Results of pure applications by (name, args), least recently used first
+            self._result_cache: "OrderedDict[Tuple[str, Tuple[str, ...]], ApplicationExecutionResult]" = OrderedDict()
+            
+            # Resolve working directories and virtual environments once for all tool calls
+            self._resolved_apps: Dict[str, ResolvedApplication] = {
+                app_name: self._resolve_application(app_config)
+                for app_name, app_config in self.config.applications.items()
+            }
+            
             # 为Python应用设置虚拟环境
             self._setup_python_environments()
             
-            # Create the MCP server
+            # Applications don't change at runtime, so the list_applications response is built once
+            self._applications_list = ApplicationsList(applications=[
+                ApplicationStatus(
+                    name=app_name,
+                    available=self._resolved_apps[app_name].available,
+                    description=app_config.description
+                )
+                for app_name, app_config in self.config.applications.items()
+            ])
+            
+            # Create the MCP server; fastmcp is imported here as it is slow to import
+            from fastmcp import FastMCP
             self.mcp = FastMCP("Applications Wrapper")
             
             # Register tools
             self._register_tools()
             logger.info("MCP server initialized successfully")
         except Exception as e:
-            logger.error(f"Failed to initialize AppConfigManager: {e}")
-            logger.debug(traceback.format_exc())
+            _log_exception(f"Failed to initialize AppConfigManager: {e}")
             raise
     
+    def _resolve_application(self, app_config: ApplicationConfig) -> ResolvedApplication:
+        """Resolve the working directory and virtual environment of an application."""
+        working_dir = app_config.working_directory
+        if not os.path.isabs(working_dir):
+            working_dir = os.path.join(ROOT_DIR, working_dir)
+        resolved = ResolvedApplication(working_dir=working_dir, available=os.path.isdir(working_dir))
+        
+        # Only Python applications run from a virtual environment
+        if resolved.available and app_config.interpreter_type == "python":
+            self._resolve_venv(app_config, resolved)
+        
+        # Build the base command once; tool calls only append their own arguments
+        if resolved.python_exec:
+            # Use the venv's interpreter with an absolute path to the script
+            app_script = app_config.command
+            if not os.path.isabs(app_script):
+                app_script = os.path.join(working_dir, app_script)
+            resolved.command = [resolved.python_exec, app_script]
+            if app_config.skip_site:
+                resolved.command.insert(1, "-S")
+        else:
+            resolved.command = ApplicationRunner(app_config).build_command()
+        return resolved
+    
+    @staticmethod
+    def _resolve_venv(app_config: ApplicationConfig, resolved: ResolvedApplication):
+        """Fill in the virtual environment paths of a Python application, if it has one."""
+        resolved.venv_path = _find_venv(resolved.working_dir)
+        if resolved.venv_path is None:
+            return
+        
+        logger.info(f"Found Python virtual environment for {app_config.name}: {resolved.venv_path}")
+        python_exec = _venv_executable(resolved.venv_path, 'python')
+        if os.path.exists(python_exec):
+            resolved.python_exec = python_exec
+        else:
+            logger.warning(f"Python executable not found in virtual environment: {python_exec}")
+        pip_path = _venv_executable(resolved.venv_path, 'pip')
+        if os.path.exists(pip_path):
+            resolved.pip_path = pip_path
+    
     def _setup_python_environments(self):
         """Setup and check virtual environments for each Python application"""
         try:
             logger.info("Setting up Python virtual environments...")
-            for app_name, app_config in self.config.applications.items():
-                # Only process Python applications
-                if app_config.interpreter_type != "python":
-                    continue
-                
-                # Get the absolute path of the working directory
-                working_dir = app_config.working_directory
-                if not os.path.isabs(working_dir):
-                    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                    working_dir = os.path.join(root_dir, working_dir)
-                
-                # Check if the working directory exists
-                if not os.path.exists(working_dir):
-                    logger.warning(f"Working directory for app {app_name} not found: {working_dir}")
-                    continue
-                
-                # Check if a virtual environment already exists
-                venv_found = False
-                venv_path = None
+            python_apps = [
+                (app_name, app_config)
+                for app_name, app_config in self.config.applications.items()
+                if app_config.interpreter_type == "python"
+            ]
+            
+            if python_apps:
+                # Applications in the same directory share its venv and requirements.txt, so
+                # each venv is prepared by exactly one job
+                apps_by_venv: Dict[str, List[str]] = {}
+                for app_name, app_config in python_apps:
+                    resolved = self._resolved_apps[app_name]
+                    if app_config.skip_site and os.path.exists(os.path.join(resolved.working_dir, 'requirements.txt')):
+                        # -S leaves the venv's site-packages off sys.path
+                        logger.warning(f"{app_name} sets skip_site but has a requirements.txt; its packages won't be importable")
+                    venv_path = resolved.venv_path or os.path.join(resolved.working_dir, 'venv')
+                    apps_by_venv.setdefault(os.path.normcase(os.path.abspath(venv_path)), []).append(app_name)
                 
-                for venv_dir in ['venv', '.venv', 'env', '.env']:
-                    check_path = os.path.join(working_dir, venv_dir)
-                    if os.path.exists(check_path):
-                        venv_found = True
-                        venv_path = check_path
-                        logger.info(f"Found existing Python virtual environment for {app_name}: {venv_path}")
-                        break
+                # Different venvs are independent, and setting one up is mostly spent waiting
+                # on subprocesses and the network
+                with ThreadPoolExecutor(max_workers=min(8, len(apps_by_venv))) as pool:
+                    futures = {
+                        pool.submit(self._prepare_one_env, app_names[0], self.config.applications[app_names[0]]): app_names
+                        for app_names in apps_by_venv.values()
+                    }
+                    for future in as_completed(futures):
+                        status = future.result()
+                        for app_name in futures[future]:
+                            # Pick up virtual environments created during setup
+                            if self._resolved_apps[app_name].venv_path is None:
+                                app_config = self.config.applications[app_name]
+                                self._resolved_apps[app_name] = self._resolve_application(app_config)
+                            if status.ready:
+                                logger.info(f"Python environment ready for {app_name}")
+                            else:
+                                logger.warning(f"Python environment not ready for {app_name}: {status.message}")
+            
+            logger.info("Finished setting up Python virtual environments")
+        except Exception as e:
+            _log_exception(f"Error setting up Python environments: {e}")
+    
+    def _prepare_one_env(self, app_name: str, app_config: ApplicationConfig) -> EnvironmentSetupStatus:
+        """Create the virtual environment of a Python application and install its requirements.
+        
+        Runs on a worker thread, the only one working on this venv. The only shared state
+        it writes is the _pip_versions entry of the venv's pip.
+        """
+        try:
+            resolved = self._resolved_apps[app_name]
+            working_dir = resolved.working_dir
+            
+            # Check if the working directory exists
+            if not resolved.available:
+                logger.warning(f"Working directory for app {app_name} not found: {working_dir}")
+                return EnvironmentSetupStatus(name=app_name, message=f"Working directory not found: {working_dir}")
+            
+            # Check if a virtual environment already exists
+            venv_path = resolved.venv_path
+            venv_found = venv_path is not None
+            
+            # If no virtual environment found, create one
+            if not venv_found:
+                # Default venv directory name
+                venv_path = os.path.join(working_dir, 'venv')
+                logger.info(f"Creating Python virtual environment for {app_name} at {venv_path}")
                 
-                # If no virtual environment found, create one
-                if not venv_found:
-                    # Default venv directory name
-                    venv_path = os.path.join(working_dir, 'venv')
-                    logger.info(f"Creating Python virtual environment for {app_name} at {venv_path}")
-                    
+                try:
+                    # Build the environment in-process rather than starting another interpreter
+                    import venv
+                    builder = venv.EnvBuilder(with_pip=True, symlinks=os.name != 'nt')
+                    builder.create(venv_path)
+                    logger.info(f"Successfully created Python virtual environment for {app_name}")
+                    venv_found = True
+                except Exception as e:
+                    logger.warning(f"Failed to create virtual environment with venv module: {e}")
+                    # Fall back to running the venv module in a separate interpreter
                     try:
-                        # Use subprocess to create virtual environment
-                        subprocess_env = os.environ.copy()
                         cmd = [sys.executable, "-m", "venv", venv_path]
-                        logger.debug(f"Running virtual environment creation command: {' '.join(cmd)}")
+                        logger.info("Trying to create venv using a subprocess")
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug("Running virtual environment creation command: %s", shlex.join(cmd))
                         
                         result = subprocess.run(
                             cmd,
                             cwd=working_dir,
-                            env=subprocess_env,
                             stdout=subprocess.PIPE,
                             stderr=subprocess.PIPE,
                             text=True,
@@ -115,172 +319,215 @@ class AppConfigManager:
                             logger.info(f"Successfully created Python virtual environment for {app_name}")
                             venv_found = True
                         else:
-                            logger.warning(f"Failed to create virtual environment: {result.stderr}")
-                            # Try using Python's built-in venv module
-                            try:
-                                import venv
-                                logger.info("Trying to create venv using built-in venv module")
-                                venv.create(venv_path, with_pip=True)
-                                logger.info(f"Successfully created Python virtual environment using venv module")
-                                venv_found = True
-                            except Exception as e:
-                                logger.error(f"Failed to create virtual environment with venv module: {e}")
-                                logger.debug(traceback.format_exc())
+                            logger.error(f"Failed to create virtual environment: {result.stderr}")
                     except Exception as e:
-                        logger.error(f"Error creating virtual environment: {e}")
-                        logger.debug(traceback.format_exc())
-                    
-                    # If virtual environment created successfully, ensure pip is up to date
-                    if venv_found:
-                        try:
-                            # Determine pip path
-                            if os.name == 'nt':  # Windows
-                                pip_path = os.path.join(venv_path, 'Scripts', 'pip.exe')
-                                if not os.path.exists(pip_path):
-                                    pip_path = os.path.join(venv_path, 'Scripts', 'pip')
-                            else:  # Unix/Linux/macOS
-                                pip_path = os.path.join(venv_path, 'bin', 'pip')
+                        _log_exception(f"Error creating virtual environment: {e}")
+                
+                # If virtual environment created successfully, ensure pip is up to date
+                if venv_found:
+                    try:
+                        pip_path = _venv_executable(venv_path, 'pip')
+                        
+                        # Check if pip exists
+                        if not os.path.exists(pip_path):
+                            logger.warning(f"Pip not found in virtual environment: {pip_path}")
+                        elif self._pip_version(pip_path, working_dir) >= PIP_BOOTSTRAP_MIN_VERSION:
+                            logger.info(f"Pip for {app_name} is recent enough, skipping upgrade")
+                        else:
+                            # Update pip. This has to finish before requirements are installed: both
+                            # pip runs write the same site-packages, and this one replaces pip itself
+                            upgrade_result = self._run_pip(
+                                pip_path, ["install", "--upgrade", "pip", "setuptools", "wheel"], working_dir
+                            )
                             
-                            # Check if pip exists
-                            if os.path.exists(pip_path):
-                                # Update pip
-                                upgrade_cmd = [pip_path, "install", "--upgrade", "pip", "setuptools", "wheel"]
-                                logger.debug(f"Upgrading pip with command: {' '.join(upgrade_cmd)}")
-                                
-                                upgrade_result = subprocess.run(
-                                    upgrade_cmd,
-                                    cwd=working_dir,
-                                    env=os.environ.copy(),
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE,
-                                    text=True,
-                                    check=False
-                                )
-                                
-                                if upgrade_result.returncode == 0:
-                                    logger.info(f"Successfully upgraded pip for {app_name}")
-                                else:
-                                    logger.warning(f"Failed to upgrade pip: {upgrade_result.stderr}")
+                            if upgrade_result.returncode == 0:
+                                logger.info(f"Successfully upgraded pip for {app_name}")
+                                # The cached version is stale now
+                                self._pip_versions.pop(pip_path, None)
                             else:
-                                logger.warning(f"Pip not found in virtual environment: {pip_path}")
-                        except Exception as e:
-                            logger.error(f"Error upgrading pip: {e}")
-                            logger.debug(traceback.format_exc())
-
-                # Check if there's a requirements.txt file
-                req_file = os.path.join(working_dir, 'requirements.txt')
-                if os.path.exists(req_file):
-                    logger.info(f"Found requirements.txt for {app_name}, installing dependencies...")
+                                logger.warning(f"Failed to upgrade pip: {upgrade_result.stderr}")
+                    except Exception as e:
+                        _log_exception(f"Error upgrading pip: {e}")
+
+            # Check if there's a requirements.txt file
+            requirements_ok = True
+            req_file = os.path.join(working_dir, 'requirements.txt')
+            if os.path.exists(req_file):
+                logger.info(f"Found requirements.txt for {app_name}, installing dependencies...")
+                
+                pip_path = resolved.pip_path or _venv_executable(venv_path, 'pip')
+                if not os.path.exists(pip_path):
+                    logger.warning(f"Pip not found in virtual environment, can't install requirements: {pip_path}")
+                    return EnvironmentSetupStatus(name=app_name, venv_path=venv_path, message=f"Pip not found: {pip_path}")
+                
+                # Clean requirements.txt content
+                fixed_lines = []
+                temp_req_file = None
+                req_hash = None
+                try:
+                    with open(req_file, 'r') as f:
+                        req_text = f.read()
                     
-                    # Determine pip path
-                    if os.name == 'nt':  # Windows
-                        pip_path = os.path.join(venv_path, 'Scripts', 'pip.exe')
-                        if not os.path.exists(pip_path):
-                            pip_path = os.path.join(venv_path, 'Scripts', 'pip')
-                    else:  # Unix/Linux/macOS
-                        pip_path = os.path.join(venv_path, 'bin', 'pip')
+                    # Drop blank and comment lines, and anything after a stray '%'
+                    fixed_lines = _REQUIREMENT_LINE_RE.findall(req_text)
+                    has_issues = '%' in req_text and _STRAY_PERCENT_RE.search(req_text) is not None
                     
-                    if not os.path.exists(pip_path):
-                        logger.warning(f"Pip not found in virtual environment, can't install requirements: {pip_path}")
-                        continue
+                    # Skip pip entirely when this exact set was already installed into the venv
+                    req_hash = hashlib.sha256('\n'.join(fixed_lines).encode()).hexdigest()
+                    if self._read_requirements_hash(venv_path) == req_hash:
+                        logger.info(f"Requirements for {app_name} unchanged since last install, skipping")
+                        return EnvironmentSetupStatus(name=app_name, venv_path=venv_path, ready=True)
                     
-                    # Clean requirements.txt content
-                    try:
-                        with open(req_file, 'r') as f:
-                            req_content = f.readlines()
-                        
-                        fixed_lines = []
-                        has_issues = False
-                        
-                        for line in req_content:
-                            # Remove trailing whitespace and newlines
-                            line = line.strip()
-                            if not line or line.startswith('#'):
-                                continue
-                            
-                            # Check and fix common formatting issues
-                            if '%' in line:
-                                has_issues = True
-                                line = line.split('%')[0].strip()
-                            
-                            if line:
-                                fixed_lines.append(line)
-                        
-                        # If issues found, create a fixed temporary file
-                        if has_issues:
-                            temp_req_file = os.path.join(working_dir, 'requirements.fixed.txt')
-                            with open(temp_req_file, 'w') as f:
-                                f.write('\n'.join(fixed_lines))
-                            logger.info(f"Created fixed requirements file at {temp_req_file}")
-                            install_req_file = temp_req_file
-                        else:
-                            install_req_file = req_file
-                    except Exception as e:
-                        logger.error(f"Error processing requirements.txt: {e}")
-                        logger.debug(traceback.format_exc())
+                    # If issues found, create a fixed temporary file
+                    if has_issues:
+                        temp_req_file = os.path.join(working_dir, 'requirements.fixed.txt')
+                        with open(temp_req_file, 'w') as f:
+                            f.write('\n'.join(fixed_lines))
+                        logger.info(f"Created fixed requirements file at {temp_req_file}")
+                        install_req_file = temp_req_file
+                    else:
                         install_req_file = req_file
+                except Exception as e:
+                    _log_exception(f"Error processing requirements.txt: {e}")
+                    req_hash = None
+                    install_req_file = req_file
+                
+                # Install dependencies
+                try:
+                    install_args = ['install', '--prefer-binary']
+                    if self._pip_version(pip_path, working_dir) >= PIP_FAST_DEPS_MIN_VERSION:
+                        install_args.append('--use-feature=fast-deps')
+                    install_args += ['-r', install_req_file]
+                    install_result = self._run_pip(pip_path, install_args, working_dir)
                     
-                    # Install dependencies
-                    try:
-                        install_cmd = [pip_path, 'install', '-r', install_req_file]
-                        logger.debug(f"Installing dependencies with command: {' '.join(install_cmd)}")
+                    if install_result.returncode == 0:
+                        logger.info(f"Successfully installed dependencies for {app_name}")
+                    else:
+                        logger.warning(f"Failed to install dependencies: {install_result.stderr}")
                         
-                        install_result = subprocess.run(
-                            install_cmd,
-                            cwd=working_dir,
-                            env=os.environ.copy(),
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            text=True,
-                            check=False
+                        # Retry in batches so one bad requirement doesn't block the rest
+                        logger.info("Retrying installation of the requirements in batches")
+                        requirements_ok = bool(fixed_lines) and self._install_in_batches(
+                            app_name, pip_path, fixed_lines, working_dir
                         )
-                        
-                        if install_result.returncode == 0:
-                            logger.info(f"Successfully installed dependencies for {app_name}")
-                        else:
-                            logger.warning(f"Failed to install dependencies: {install_result.stderr}")
-                            
-                            # Try installing dependencies one by one
-                            logger.info("Trying to install packages one by one")
-                            for dep in fixed_lines if 'fixed_lines' in locals() else []:
-                                if not dep.strip():
-                                    continue
-                                
-                                try:
-                                    one_cmd = [pip_path, 'install', dep.strip()]
-                                    logger.debug(f"Installing single package: {dep.strip()}")
-                                    
-                                    one_result = subprocess.run(
-                                        one_cmd,
-                                        cwd=working_dir,
-                                        env=os.environ.copy(),
-                                        stdout=subprocess.PIPE,
-                                        stderr=subprocess.PIPE,
-                                        text=True,
-                                        check=False
-                                    )
-                                    
-                                    if one_result.returncode == 0:
-                                        logger.info(f"Installed {dep.strip()}")
-                                    else:
-                                        logger.warning(f"Failed to install {dep.strip()}: {one_result.stderr}")
-                                except Exception as e:
-                                    logger.error(f"Error installing {dep.strip()}: {e}")
+                except Exception as e:
+                    requirements_ok = False
+                    _log_exception(f"Error installing dependencies: {e}")
+                
+                if requirements_ok and req_hash:
+                    self._write_requirements_hash(venv_path, req_hash)
+                
+                # Clean up temporary files
+                if temp_req_file and os.path.exists(temp_req_file):
+                    try:
+                        os.remove(temp_req_file)
                     except Exception as e:
-                        logger.error(f"Error installing dependencies: {e}")
-                        logger.debug(traceback.format_exc())
-                    
-                    # Clean up temporary files
-                    if 'temp_req_file' in locals() and os.path.exists(temp_req_file):
-                        try:
-                            os.remove(temp_req_file)
-                        except Exception as e:
-                            logger.debug(f"Failed to remove temporary file: {e}")
+                        logger.debug("Failed to remove temporary file: %s", e)
             
-            logger.info("Finished setting up Python virtual environments")
+            if not venv_found:
+                return EnvironmentSetupStatus(name=app_name, venv_path=venv_path, message="Virtual environment could not be created")
+            if not requirements_ok:
+                return EnvironmentSetupStatus(name=app_name, venv_path=venv_path, message="Some requirements failed to install")
+            return EnvironmentSetupStatus(name=app_name, venv_path=venv_path, ready=True)
         except Exception as e:
-            logger.error(f"Error setting up Python environments: {e}")
-            logger.debug(traceback.format_exc())
+            _log_exception(f"Error setting up Python environment for {app_name}: {e}")
+            return EnvironmentSetupStatus(name=app_name, message=str(e))
+    
+    @staticmethod
+    def _read_requirements_hash(venv_path: str) -> Optional[str]:
+        """Return the requirements hash recorded in a venv, if any"""
+        try:
+            with open(os.path.join(venv_path, REQUIREMENTS_HASH_FILE), 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+    
+    @staticmethod
+    def _write_requirements_hash(venv_path: str, req_hash: str):
+        """Record the requirements hash in a venv, replacing the file atomically"""
+        hash_file = os.path.join(venv_path, REQUIREMENTS_HASH_FILE)
+        temp_file = f"{hash_file}.tmp"
+        try:
+            with open(temp_file, 'w') as f:
+                f.write(req_hash)
+            os.replace(temp_file, hash_file)
+        except OSError as e:
+            logger.debug("Failed to record requirements hash: %s", e)
+    
+    def _run_pip(self, pip_path: str, pip_args: List[str], working_dir: str,
+                 capture_stdout: bool = False) -> subprocess.CompletedProcess:
+        """Run pip from a virtual environment and return the completed process.
+        
+        Pip's progress output is discarded unless debug logging is on or capture_stdout
+        is set; stderr is always captured for error reporting.
+        """
+        cmd = [pip_path, *pip_args, *PIP_COMMON_ARGS]
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Running pip command: %s", shlex.join(cmd))
+        
+        result = subprocess.run(
+            cmd,
+            cwd=working_dir,
+            stdout=subprocess.PIPE if capture_stdout or debug else subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=False
+        )
+        if debug and result.stdout:
+            logger.debug("pip output:\n%s", result.stdout)
+        return result
+    
+    def _pip_version(self, pip_path: str, working_dir: str) -> Tuple[int, ...]:
+        """Get the version of a venv's pip, or an empty tuple if it can't be determined."""
+        if pip_path not in self._pip_versions:
+            version: Tuple[int, ...] = ()
+            try:
+                result = self._run_pip(pip_path, ['--version'], working_dir, capture_stdout=True)
+                # Output looks like "pip 23.2.1 from /path/to/site-packages/pip (python 3.11)"
+                parts = result.stdout.split()
+                if result.returncode == 0 and len(parts) > 1:
+                    version = tuple(int(p) for p in parts[1].split('.')[:2] if p.isdigit())
+            except Exception as e:
+                logger.debug("Failed to determine pip version for %s: %s", pip_path, e)
+            self._pip_versions[pip_path] = version
+        return self._pip_versions[pip_path]
+    
+    def _install_in_batches(self, app_name: str, pip_path: str, requirements: List[str], working_dir: str) -> bool:
+        """Install requirements a batch at a time, falling back to one by one for failed batches.
+        
+        Returns True if every requirement was installed.
+        """
+        all_installed = True
+        # A single batch would just repeat the install that already failed
+        try_batches = len(requirements) > PIP_BATCH_SIZE
+        
+        for start in range(0, len(requirements), PIP_BATCH_SIZE):
+            batch = requirements[start:start + PIP_BATCH_SIZE]
+            if try_batches:
+                try:
+                    batch_result = self._run_pip(pip_path, ['install', *batch], working_dir)
+                    if batch_result.returncode == 0:
+                        logger.info(f"Installed {', '.join(batch)} for {app_name}")
+                        continue
+                    logger.warning(f"Failed to install batch for {app_name}: {batch_result.stderr}")
+                except Exception as e:
+                    logger.error(f"Error installing batch for {app_name}: {e}")
+            
+            # Only the packages of the failing batch are retried one by one
+            for dep in batch:
+                try:
+                    one_result = self._run_pip(pip_path, ['install', dep], working_dir)
+                    if one_result.returncode == 0:
+                        logger.info(f"Installed {dep}")
+                    else:
+                        all_installed = False
+                        logger.warning(f"Failed to install {dep}: {one_result.stderr}")
+                except Exception as e:
+                    all_installed = False
+                    logger.error(f"Error installing {dep}: {e}")
+        
+        return all_installed
     
     def _register_tools(self):
         """Register all the MCP tools."""
@@ -290,25 +537,10 @@ class AppConfigManager:
             """List all configured applications and their status."""
             try:
                 logger.info("Listing applications")
-                applications = []
-                
-                for app_name, app_config in self.config.applications.items():
-                    # Check if the application is available - by default all apps are available
-                    available = True
-                    # If needed, add logic to check if the application is available
-                    
-                    applications.append(ApplicationStatus(
-                        name=app_name,
-                        available=available,
-                        description=app_config.description
-                    ))
-                
-                result = ApplicationsList(applications=applications)
-                logger.debug(f"Returning {len(applications)} applications")
-                return result
+                logger.debug("Returning %s applications", len(self._applications_list.applications))
+                return self._applications_list
             except Exception as e:
-                logger.error(f"Error listing applications: {e}")
-                logger.debug(traceback.format_exc())
+                _log_exception(f"Error listing applications: {e}")
                 # Return empty list instead of failing
                 return ApplicationsList(applications=[])
         
@@ -320,12 +552,11 @@ class AppConfigManager:
                 return self.config.deployment_mode.value
             except Exception as e:
                 error_msg = f"Error getting deployment mode: {str(e)}"
-                logger.error(error_msg)
-                logger.debug(traceback.format_exc())
+                _log_exception(error_msg)
                 return "unknown"
         
         @self.mcp.tool()
-        def get_application_help(name: str) -> ApplicationExecutionResult:
+        async def get_application_help(name: str) -> ApplicationExecutionResult:
             """
             Get the command-line help for an application by running it with --help flag.
             
@@ -345,21 +576,16 @@ class AppConfigManager:
                         exit_code=1,
                         success=False
                     )
-                    logger.debug(f"Returning error result: {result}")
+                    logger.debug("Returning error result: %s", result)
                     return result
                 
                 # Get application config
                 app_config = self.config.applications[name]
+                resolved = self._resolved_apps[name]
+                working_dir = resolved.working_dir
                 
-                # Working directory - ensure path is absolute
-                working_dir = app_config.working_directory
-                if not os.path.isabs(working_dir):
-                    # Convert to absolute path relative to current directory
-                    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                    working_dir = os.path.join(root_dir, working_dir)
-                
-                # Check if directory exists
-                if not os.path.exists(working_dir):
+                # Working directory existence was checked when the config was loaded
+                if not resolved.available:
                     error_msg = f"Working directory not found: {working_dir}"
                     logger.error(error_msg)
                     return ApplicationExecutionResult(
@@ -369,80 +595,45 @@ class AppConfigManager:
                         success=False
                     )
                 
-                # Create a runner for this application
-                runner = ApplicationRunner(app_config)
-                
-                # Check if there's a Python virtual environment in the working directory
-                venv_paths = []
-                
-                # Standard virtual environment directory names
-                for venv_dir in ['venv', '.venv', 'env', '.env']:
-                    venv_path = os.path.join(working_dir, venv_dir)
-                    if os.path.exists(venv_path):
-                        venv_paths.append(venv_path)
-                        logger.info(f"Found Python virtual environment: {venv_path}")
-                
-                # Build the command
-                cmd = []
-                
-                # If virtual environment found, use its Python interpreter
-                if venv_paths and app_config.interpreter_type == "python":
-                    logger.info(f"Using Python from virtual environment: {venv_paths[0]}")
-                    # Check platform to determine correct interpreter path
-                    if os.name == 'nt':  # Windows
-                        python_exec = os.path.join(venv_paths[0], 'Scripts', 'python.exe')
-                    else:  # Unix/Linux/macOS
-                        python_exec = os.path.join(venv_paths[0], 'bin', 'python')
-                    
-                    if os.path.exists(python_exec):
-                        cmd.append(python_exec)
-                        
-                        # Ensure using absolute path to find Python scripts
-                        app_script = app_config.command
-                        if not os.path.isabs(app_script):
-                            app_script = os.path.join(working_dir, app_script)
-                            logger.info(f"Using absolute script path: {app_script}")
-                        cmd.append(app_script)
-                    else:
-                        logger.warning(f"Python executable not found in virtual environment: {python_exec}")
-                        # Fallback to standard command
-                        cmd = runner.build_command()
-                else:
-                    # Use standard command
-                    cmd = runner.build_command()
-                
-                # Add --help parameter
-                cmd.append("--help")
+                # Ask the application for its --help output
+                cmd = self._build_cmd_for(name, ["--help"])
                 
                 # Execute the command
                 try:
                     logger.info(f"Executing help command in directory: {working_dir}")
-                    logger.debug(f"Command: {' '.join(cmd)}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Command: %s", shlex.join(cmd))
                     
                     # Set current working directory
-                    result = subprocess.run(
-                        cmd,
+                    process = await asyncio.create_subprocess_exec(
+                        *cmd,
                         cwd=working_dir,
-                        env=os.environ.copy(),
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                        check=False
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE
                     )
                     
-                    logger.debug(f"Help command result: exit_code={result.returncode}")
+                    # Read into bounded buffers, like execute_application
+                    output_cap = DEFAULT_MAX_OUTPUT_BYTES if app_config.max_output_bytes is None else app_config.max_output_bytes
+                    stdout_buf = bytearray()
+                    stderr_buf = bytearray()
+                    await asyncio.gather(
+                        self._drain(process.stdout, stdout_buf, output_cap),
+                        self._drain(process.stderr, stderr_buf, output_cap),
+                        process.wait()
+                    )
+                    
+                    logger.debug("Help command result: exit_code=%s", process.returncode)
                     result_obj = ApplicationExecutionResult(
-                        stdout=result.stdout,
-                        stderr=result.stderr,
-                        exit_code=result.returncode,
-                        success=result.returncode == 0
+                        stdout=stdout_buf.decode('utf-8', 'replace'),
+                        stderr=stderr_buf.decode('utf-8', 'replace'),
+                        exit_code=process.returncode,
+                        success=process.returncode == 0
                     )
-                    logger.debug(f"Returning result: success={result_obj.success}")
+                    logger.debug("Returning result: success=%s", result_obj.success)
                     return result_obj
                 except Exception as e:
                     error_msg = f"Error executing help command: {str(e)}"
-                    logger.error(error_msg)
-                    logger.debug(traceback.format_exc())
+                    _log_exception(error_msg)
                     return ApplicationExecutionResult(
                         stdout="",
                         stderr=f"Error executing application: {str(e)}",
@@ -451,8 +642,7 @@ class AppConfigManager:
                     )
             except Exception as e:
                 error_msg = f"Error getting help for application {name}: {str(e)}"
-                logger.error(error_msg)
-                logger.debug(traceback.format_exc())
+                _log_exception(error_msg)
                 return ApplicationExecutionResult(
                     stdout="",
                     stderr=error_msg,
@@ -461,7 +651,7 @@ class AppConfigManager:
                 )
         
         @self.mcp.tool()
-        def execute_application(name: str, args: List[str] = None) -> ApplicationExecutionResult:
+        async def execute_application(name: str, args: List[str] = None) -> ApplicationExecutionResult:
             """
             Execute an application with the provided arguments.
             
@@ -488,16 +678,11 @@ class AppConfigManager:
                 
                 # Get application config
                 app_config = self.config.applications[name]
+                resolved = self._resolved_apps[name]
+                working_dir = resolved.working_dir
                 
-                # Working directory - ensure path is absolute
-                working_dir = app_config.working_directory
-                if not os.path.isabs(working_dir):
-                    # Convert to absolute path relative to current directory
-                    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                    working_dir = os.path.join(root_dir, working_dir)
-                
-                # Check if directory exists
-                if not os.path.exists(working_dir):
+                # Working directory existence was checked when the config was loaded
+                if not resolved.available:
                     error_msg = f"Working directory not found: {working_dir}"
                     logger.error(error_msg)
                     return ApplicationExecutionResult(
@@ -507,61 +692,26 @@ class AppConfigManager:
                         success=False
                     )
                 
-                # Check if there's a Python virtual environment in the working directory
-                venv_paths = []
-                
-                # Standard virtual environment directory names
-                for venv_dir in ['venv', '.venv', 'env', '.env']:
-                    venv_path = os.path.join(working_dir, venv_dir)
-                    if os.path.exists(venv_path):
-                        venv_paths.append(venv_path)
-                        logger.info(f"Found Python virtual environment: {venv_path}")
-                
-                # Create a runner for this application
-                runner = ApplicationRunner(app_config)
-                
-                # Build the command
-                cmd = []
-                
-                # If virtual environment found, use its Python interpreter
-                if venv_paths and app_config.interpreter_type == "python":
-                    logger.info(f"Using Python from virtual environment: {venv_paths[0]}")
-                    # Check platform to determine correct interpreter path
-                    if os.name == 'nt':  # Windows
-                        python_exec = os.path.join(venv_paths[0], 'Scripts', 'python.exe')
-                    else:  # Unix/Linux/macOS
-                        python_exec = os.path.join(venv_paths[0], 'bin', 'python')
-                    
-                    if os.path.exists(python_exec):
-                        cmd.append(python_exec)
-                        
-                        # Ensure using absolute path to find Python scripts
-                        app_script = app_config.command
-                        if not os.path.isabs(app_script):
-                            app_script = os.path.join(working_dir, app_script)
-                            logger.info(f"Using absolute script path: {app_script}")
-                        cmd.append(app_script)
-                    else:
-                        logger.warning(f"Python executable not found in virtual environment: {python_exec}")
-                        # Fallback to standard command
-                        cmd = runner.build_command()
-                else:
-                    # Use standard command
-                    cmd = runner.build_command()
+                # Pure applications give the same result for the same arguments, so reuse it
+                cache_key = (name, tuple(args))
+                if app_config.pure and cache_key in self._result_cache:
+                    logger.info(f"Returning cached result for {name}")
+                    self._result_cache.move_to_end(cache_key)
+                    return self._result_cache[cache_key]
                 
                 # Add user parameters
-                cmd.extend(args)
+                cmd = self._build_cmd_for(name, args)
                 
                 # Execute the command
                 try:
                     logger.info(f"Executing {name} with args: {args} in directory: {working_dir}")
-                    logger.debug(f"Command: {' '.join(cmd)}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Command: %s", shlex.join(cmd))
                     
                     # Set environment variables
-                    env = os.environ.copy()
+                    env = child_env(app_config.env_vars)
                     if app_config.env_vars:
-                        env.update(app_config.env_vars)
-                        logger.debug(f"Added environment variables: {app_config.env_vars}")
+                        logger.debug("Added environment variables: %s", app_config.env_vars)
                     
                     # Get application-specific timeout if set
                     timeout_value = app_config.timeout
@@ -572,25 +722,41 @@ class AppConfigManager:
                         timeout_value = 3600  # 1 hour default timeout
                         logger.info(f"No timeout specified for application, using default timeout of {timeout_value} seconds")
                     
-                    # Use subprocess.Popen and asyncio to handle timeout
-                    process = subprocess.Popen(
-                        cmd,
+                    # Run the process without blocking the event loop, so other tool calls are served meanwhile.
+                    # No preexec_fn (start_new_session instead), so CPython can launch it with vfork
+                    process = await asyncio.create_subprocess_exec(
+                        *cmd,
                         cwd=working_dir,
                         env=env,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True
+                        stdout=asyncio.subprocess.PIPE,
+                        # A merged stderr arrives interleaved with stdout; there is no stderr pipe then
+                        stderr=asyncio.subprocess.STDOUT if app_config.merge_stderr else asyncio.subprocess.PIPE,
+                        **PROCESS_GROUP_KWARGS
                     )
                     
+                    # Output is streamed into bounded buffers, so they hold whatever was read if the timeout hits
+                    output_cap = DEFAULT_MAX_OUTPUT_BYTES if app_config.max_output_bytes is None else app_config.max_output_bytes
+                    stdout_buf = bytearray()
+                    stderr_buf = bytearray()
+                    
                     try:
                         # Set timeout
-                        stdout, stderr = process.communicate(timeout=timeout_value)
+                        await asyncio.wait_for(
+                            asyncio.gather(
+                                self._drain(process.stdout, stdout_buf, output_cap),
+                                self._drain(process.stderr, stderr_buf, output_cap),
+                                process.wait()
+                            ),
+                            timeout=timeout_value
+                        )
+                        stdout = stdout_buf.decode('utf-8', 'replace')
+                        stderr = stderr_buf.decode('utf-8', 'replace')
                         exit_code = process.returncode
                         
-                        logger.debug(f"Execution result: exit_code={exit_code}")
+                        logger.debug("Execution result: exit_code=%s", exit_code)
                         if exit_code != 0:
                             logger.warning(f"Application {name} exited with non-zero code: {exit_code}")
-                            logger.debug(f"stderr: {stderr}")
+                            logger.debug("stderr: %s", stderr)
                         
                         result_obj = ApplicationExecutionResult(
                             stdout=stdout,
@@ -598,16 +764,35 @@ class AppConfigManager:
                             exit_code=exit_code,
                             success=exit_code == 0
                         )
-                        logger.debug(f"Returning result: success={result_obj.success}")
+                        logger.debug("Returning result: success=%s", result_obj.success)
+                        # Failures may be transient, so only successful results are reused
+                        if app_config.pure and result_obj.success:
+                            self._result_cache[cache_key] = result_obj
+                            if len(self._result_cache) > RESULT_CACHE_SIZE:
+                                self._result_cache.popitem(last=False)
                         return result_obj
                         
-                    except subprocess.TimeoutExpired:
+                    except asyncio.TimeoutError:
                         # Timeout occurred, terminate process
                         logger.warning(f"Application {name} execution timed out after {timeout_value} seconds")
-                        process.kill()
+                        self._kill_process_group(process)
+                        
+                        # Collect what is still in the pipes, unless something outside the group keeps them open
+                        try:
+                            await asyncio.wait_for(
+                                asyncio.gather(
+                                    self._drain(process.stdout, stdout_buf, output_cap),
+                                    self._drain(process.stderr, stderr_buf, output_cap),
+                                    process.wait()
+                                ),
+                                timeout=POST_KILL_DRAIN_TIMEOUT
+                            )
+                        except asyncio.TimeoutError:
+                            logger.warning(f"Output of {name} still open {POST_KILL_DRAIN_TIMEOUT}s after it was killed")
                         
                         # Get output (may be partial output)
-                        stdout, stderr = process.communicate()
+                        stdout = stdout_buf.decode('utf-8', 'replace')
+                        stderr = stderr_buf.decode('utf-8', 'replace')
                         
                         return ApplicationExecutionResult(
                             stdout=stdout,
@@ -618,8 +803,7 @@ class AppConfigManager:
                         
                 except Exception as e:
                     error_msg = f"Error executing application command: {str(e)}"
-                    logger.error(error_msg)
-                    logger.debug(traceback.format_exc())
+                    _log_exception(error_msg)
                     return ApplicationExecutionResult(
                         stdout="",
                         stderr=f"Error executing application: {str(e)}",
@@ -628,8 +812,7 @@ class AppConfigManager:
                     )
             except Exception as e:
                 error_msg = f"Error executing application {name}: {str(e)}"
-                logger.error(error_msg)
-                logger.debug(traceback.format_exc())
+                _log_exception(error_msg)
                 return ApplicationExecutionResult(
                     stdout="",
                     stderr=error_msg,
@@ -637,6 +820,48 @@ class AppConfigManager:
                     success=False
                 )
     
+    def _build_cmd_for(self, app_name: str, args: List[str]) -> List[str]:
+        """Build the command line for one run of an application, from the command resolved at load time."""
+        return [*self._resolved_apps[app_name].command, *args]
+    
+    @staticmethod
+    async def _drain(stream: Optional[asyncio.StreamReader], buffer: bytearray, cap: int):
+        """Read a subprocess stream until EOF, keeping at most cap bytes in buffer.
+        
+        Reading continues past the cap so the child never blocks on a full pipe. Can be
+        called again on a buffer filled by an earlier, cancelled drain of the same stream.
+        """
+        if stream is None:
+            # stderr merged into stdout
+            return
+        truncated = len(buffer) > cap
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                break
+            if truncated:
+                continue
+            room = cap - len(buffer)
+            if len(chunk) <= room:
+                buffer += chunk
+            else:
+                buffer += chunk[:room]
+                buffer += OUTPUT_TRUNCATED_MARKER
+                truncated = True
+    
+    @staticmethod
+    def _kill_process_group(process: asyncio.subprocess.Process):
+        """Kill an application started in its own process group, along with its children."""
+        try:
+            if os.name == 'nt':
+                process.send_signal(signal.CTRL_BREAK_EVENT)
+                process.kill()
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # Exited between the timeout and the kill
+            pass
+    
     def run(self, transport: str = "sse", host: str = "0.0.0.0", port: int = 8000):
         """Run the MCP server."""
         try:
@@ -644,27 +869,32 @@ class AppConfigManager:
             
             # If SSE transport, directly call mcp.run_sse_async instead of mcp.run
             if transport == "sse":
-                # Use anyio.run to run async function
+                # Use anyio.run to run async function, on uvloop's faster event loop when it is installed
                 import anyio
-                anyio.run(self.mcp.run_sse_async, host, port)
+                import importlib.util
+                use_uvloop = sys.platform != "win32" and importlib.util.find_spec("uvloop") is not None
+                if use_uvloop:
+                    logger.info("Using uvloop event loop")
+                anyio.run(
+                    self.mcp.run_sse_async, host, port,
+                    backend="asyncio", backend_options={"use_uvloop": use_uvloop}
+                )
             else:
                 # For stdio and other transports, use standard run method
                 self.mcp.run(transport=transport)
         except KeyboardInterrupt:
             logger.info("MCP server stopped by user")
         except Exception as e:
-            logger.error(f"Error running MCP server: {e}")
-            logger.debug(traceback.format_exc())
+            _log_exception(f"Error running MCP server: {e}")
 
 
-def create_mcp_server(config_path: str) -> FastMCP:
+def create_mcp_server(config_path: str) -> "FastMCP":
     """Create an MCP server instance from a configuration file."""
     try:
         config_manager = AppConfigManager(config_path)
         return config_manager.mcp
     except Exception as e:
-        logger.error(f"Failed to create MCP server: {e}")
-        logger.debug(traceback.format_exc())
+        _log_exception(f"Failed to create MCP server: {e}")
         raise
 
 
@@ -678,6 +908,5 @@ def run_mcp_server(config_path: str, host: str = "0.0.0.0", port: int = 8000, tr
         # Run MCP server directly, passing host and port parameters
         config_manager.run(transport=transport, host=host, port=port)
     except Exception as e:
-        logger.error(f"Failed to run MCP server: {e}")
-        logger.debug(traceback.format_exc())
+        _log_exception(f"Failed to run MCP server: {e}")
         raise
@@ -1,6 +1,8 @@
+import shutil
 from enum import Enum
-from typing import Dict, List, Optional, Union
-from pydantic import BaseModel, Field, model_validator
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, model_validator
 
 
 class InterpreterType(str, Enum):
@@ -15,8 +17,19 @@ class DeploymentMode(str, Enum):
     REMOTE = "remote"
 
 
+# PATH lookups of interpreters, done once per process
+_which = lru_cache(maxsize=None)(shutil.which)
+
+
+# Validators are built on first validation rather than at import, so commands that never
+# load a config don't pay for them
+_MODEL_CONFIG = ConfigDict(defer_build=True)
+
+
 class ApplicationConfig(BaseModel):
     """Configuration for a single application."""
+    model_config = _MODEL_CONFIG
+    
     name: str
     description: Optional[str] = None
     working_directory: str
@@ -27,6 +40,13 @@ class ApplicationConfig(BaseModel):
     env_vars: Optional[Dict[str, str]] = None
     resources_limit: Optional[Dict[str, str]] = None  # CPU, memory limits
     timeout: Optional[int] = None  # Timeout in seconds for application execution
+    max_output_bytes: Optional[int] = Field(None, gt=0)  # Cap on captured stdout and stderr, each
+    pure: bool = False  # Same arguments always give the same output, so results can be cached
+    skip_site: bool = False  # Run Python applications with -S, without site-packages
+    reusable: bool = False  # ApplicationRunner only: keep one process running and send it requests on stdin
+    merge_stderr: bool = False  # Capture stderr together with stdout through one pipe
+    
+    _resolved_command: Optional[Tuple[str, ...]] = PrivateAttr(default=None)
     
     @model_validator(mode='after')
     def validate_custom_interpreter(self):
@@ -34,10 +54,38 @@ class ApplicationConfig(BaseModel):
         if self.interpreter_type == InterpreterType.CUSTOM and not self.interpreter_path:
             raise ValueError("Custom interpreter type requires interpreter_path")
         return self
+    
+    def resolve_interpreter(self) -> str:
+        """Get the interpreter to run the application with."""
+        if self.interpreter_path:
+            return self.interpreter_path
+        
+        if self.interpreter_type == InterpreterType.PYTHON:
+            import sys
+            return sys.executable  # Use the current Python interpreter
+        elif self.interpreter_type == InterpreterType.NODE:
+            return _which("node") or "node"  # Spare every launch the PATH search
+        else:
+            raise ValueError(f"Unsupported interpreter type: {self.interpreter_type}")
+    
+    @property
+    def resolved_command(self) -> Tuple[str, ...]:
+        """The command line that runs the application, resolved on first use and then reused."""
+        if self._resolved_command is None:
+            command = (self.command, *(self.args or ()))
+            # Custom applications are executables themselves
+            if self.interpreter_type == InterpreterType.PYTHON and self.skip_site:
+                command = (self.resolve_interpreter(), "-S", *command)
+            elif self.interpreter_type != InterpreterType.CUSTOM:
+                command = (self.resolve_interpreter(), *command)
+            self._resolved_command = command
+        return self._resolved_command
 
 
 class DockerConfig(BaseModel):
     """Docker-specific configuration."""
+    model_config = _MODEL_CONFIG
+    
     base_image: str = Field(default="python:3.11-slim")
     network: Optional[str] = None
     volumes: Optional[Dict[str, str]] = None  # host_path: container_path
@@ -46,6 +94,8 @@ class DockerConfig(BaseModel):
 
 class RemoteConfig(BaseModel):
     """Remote deployment configuration."""
+    model_config = _MODEL_CONFIG
+    
     host: str
     port: int = 22
     username: str
@@ -56,6 +106,8 @@ class RemoteConfig(BaseModel):
 
 class WrapperConfig(BaseModel):
     """Main configuration for the MCP application wrapper."""
+    model_config = _MODEL_CONFIG
+    
     applications: Dict[str, ApplicationConfig]
     deployment_mode: DeploymentMode = DeploymentMode.LOCAL
     docker_config: Optional[DockerConfig] = None
@@ -71,22 +123,53 @@ class WrapperConfig(BaseModel):
         return self
 
 
+def _config_cache_key(config_path: str) -> tuple:
+    """Identify a config file version."""
+    import os
+    
+    config_stat = os.stat(config_path)
+    return (config_stat.st_mtime_ns, config_stat.st_size)
+
+
 def load_config(config_path: str) -> WrapperConfig:
-    """Load configuration from a YAML or JSON file."""
-    import yaml
-    import json
+    """Load configuration from a YAML or JSON file.
+    
+    Configs are memoized per file version within the process and reused until the
+    file changes.
+    """
     import os
     
     if not os.path.exists(config_path):
         raise FileNotFoundError(f"Config file not found: {config_path}")
     
+    if not config_path.endswith(('.yaml', '.yml', '.json')):
+        raise ValueError("Config file must be YAML or JSON")
+    
+    return _load_config(os.path.abspath(config_path), _config_cache_key(config_path))
+
+
+def clear_config_cache():
+    """Forget the configs memoized by load_config in this process."""
+    _load_config.cache_clear()
+
+
+@lru_cache(maxsize=8)
+def _load_config(config_path: str, cache_key: tuple) -> WrapperConfig:
+    """Load and validate one version of a config file."""
     if config_path.endswith('.yaml') or config_path.endswith('.yml'):
+        import yaml
+        
+        # libyaml's C loader is much faster when PyYAML was built with it
+        try:
+            from yaml import CSafeLoader as Loader
+        except ImportError:
+            from yaml import SafeLoader as Loader
         with open(config_path, 'r') as file:
-            config_data = yaml.safe_load(file)
-    elif config_path.endswith('.json'):
-        with open(config_path, 'r') as file:
-            config_data = json.load(file)
+            config_data = yaml.load(file, Loader=Loader)
+        config = WrapperConfig.model_validate(config_data)
     else:
-        raise ValueError("Config file must be YAML or JSON")
+        # pydantic-core parses and validates JSON in one pass, without building dicts first
+        with open(config_path, 'rb') as file:
+            config = WrapperConfig.model_validate_json(file.read())
     
-    return WrapperConfig(**config_data)
+    return config
@@ -20,8 +20,8 @@ def main():
     greeting = "你好" if args.language == "cn" else "Hello"
     message = f"{greeting}, {args.name}!"
     
-    for i in range(args.repeat):
-        print(message)
+    # One write for all repetitions instead of a print call per line
+    sys.stdout.write((message + "\n") * args.repeat)
 
 
 if __name__ == "__main__":
@@ -6,33 +6,50 @@ from typing import Optional
 
 import typer
 from rich.console import Console
-from rich.logging import RichHandler
 
-from app.server import run_mcp_server, create_mcp_server
 from config.settings import load_config
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(message)s",
-    datefmt="[%X]",
-    handlers=[RichHandler(rich_tracebacks=True)]
-)
+# Configure logging; Rich's formatting is only worth its cost for a person watching a terminal
+if sys.stderr.isatty():
+    from rich.logging import RichHandler
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(message)s",
+        datefmt="[%X]",
+        handlers=[RichHandler(rich_tracebacks=True)]
+    )
+else:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+# None of the formats use these, so skip collecting them for every record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
 logger = logging.getLogger("mcp_wrapper")
 
 # Create Typer app
 app = typer.Typer(name="mcp-wrapper", help="MCP Applications Wrapper")
 console = Console()
 
-# Create default MCP instance for use with fastmcp install
-# Use a default config path for demonstration
+# Default MCP instance for use with fastmcp install, built from the example config on first access
 default_config_path = os.path.join(os.path.dirname(__file__), "examples", "config.yaml")
-if os.path.exists(default_config_path):
-    mcp = create_mcp_server(default_config_path)
-else:
-    # If default config doesn't exist, create a basic MCP instance
-    from fastmcp import FastMCP
-    mcp = FastMCP("Applications Wrapper")
+
+
+def __getattr__(name):
+    """Create the module-level mcp lazily, so CLI commands don't build a server they never use."""
+    if name == "mcp":
+        if os.path.exists(default_config_path):
+            from app.server import create_mcp_server
+            mcp = create_mcp_server(default_config_path)
+        else:
+            # If default config doesn't exist, create a basic MCP instance
+            from fastmcp import FastMCP
+            mcp = FastMCP("Applications Wrapper")
+        globals()["mcp"] = mcp
+        return mcp
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 @app.command()
@@ -73,7 +90,8 @@ def run(
         if (host != "0.0.0.0" or port != 8000) and transport != "sse":
             console.print("[bold yellow]Note: Host and port options are only effective when using 'sse' transport[/bold yellow]")
         
-        # Run the server
+        # Run the server; imported here so other commands don't load the server stack
+        from app.server import run_mcp_server
         console.print(f"[bold]Starting MCP server with {transport} transport...[/bold]")
         run_mcp_server(config_path, host, port, transport)
         
@@ -118,9 +136,6 @@ def create_config(
     format: str = typer.Option("yaml", help="Output format (yaml or json)"),
 ):
     """Create a sample configuration file."""
-    import json
-    import yaml
-    
     # Sample configuration
     sample_config = {
         "applications": {
@@ -164,10 +179,18 @@ def create_config(
         os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
         
         # Write the configuration
-        with open(output_path, 'w') as f:
-            if format.lower() == 'json':
-                json.dump(sample_config, f, indent=2)
-            else:
+        if format.lower() == 'json':
+            try:
+                import orjson
+                content = orjson.dumps(sample_config, option=orjson.OPT_INDENT_2)
+            except ImportError:
+                import json
+                content = json.dumps(sample_config, indent=2).encode()
+            with open(output_path, 'wb') as f:
+                f.write(content)
+        else:
+            import yaml
+            with open(output_path, 'w') as f:
                 yaml.dump(sample_config, f, default_flow_style=False)
         
         console.print(f"[bold green]Sample configuration created at {output_path}[/bold green]")
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# A command line client for a running server, not a test module
+collect_ignore = ["test_sse_client.py"]
@@ -0,0 +1,107 @@
+"""Tests for the Docker runner, against a stand-in for the docker SDK."""
+import json
+import os
+import sys
+import types
+
+import pytest
+
+from config.settings import ApplicationConfig, DockerConfig
+from utils import docker as docker_utils
+from utils.docker import DockerRunner
+
+
+@pytest.fixture(autouse=True)
+def fake_docker(monkeypatch):
+    # The SDK is imported lazily, so a module with a from_env() is all the runner needs
+    docker = types.ModuleType("docker")
+    docker.from_env = lambda: types.SimpleNamespace()
+    monkeypatch.setitem(sys.modules, "docker", docker)
+    docker_utils._docker_client_for.cache_clear()
+    yield docker
+    docker_utils._docker_client_for.cache_clear()
+
+
+def _runner(tmp_path, **options):
+    app_config = ApplicationConfig(
+        name="My App",
+        working_directory=str(tmp_path),
+        interpreter_type="python",
+        command="main.py",
+        **options
+    )
+    return DockerRunner(app_config, DockerConfig())
+
+
+def test_dockerfile_cmd_is_valid_json(tmp_path):
+    args = ["hello world", 'say "hi"', "back\\slash", "it's"]
+    dockerfile_path = _runner(tmp_path, args=args)._create_dockerfile()
+    try:
+        with open(dockerfile_path) as f:
+            lines = f.read().splitlines()
+    finally:
+        os.unlink(dockerfile_path)
+    
+    assert lines[0] == f"FROM {DockerConfig().base_image}"
+    assert lines[-1].startswith("CMD ")
+    assert json.loads(lines[-1][len("CMD "):]) == ["python", "main.py", *args]
+
+
+class _LoggingContainer:
+    def __init__(self, chunks):
+        self.chunks = chunks
+    
+    def logs(self, **kwargs):
+        assert kwargs["stream"]
+        return iter(self.chunks)
+
+
+def test_iter_logs_decodes_characters_split_across_chunks(tmp_path):
+    encoded = "héllo → wörld\n".encode()
+    runner = _runner(tmp_path)
+    # Cut inside the two-byte é and the three-byte arrow
+    runner.container = _LoggingContainer([encoded[:2], encoded[2:8], encoded[8:]])
+    
+    assert "".join(runner.iter_logs()) == "héllo → wörld\n"
+    assert runner.get_logs() == "héllo → wörld\n"
+
+
+def test_docker_client_is_shared_within_a_process(tmp_path, monkeypatch):
+    first = _runner(tmp_path)
+    assert _runner(tmp_path).client is first.client
+    
+    # A forked worker has a new pid and must not reuse the parent's connections
+    monkeypatch.setattr(docker_utils.os, "getpid", lambda: -1)
+    assert _runner(tmp_path).client is not first.client
+
+
+class _StoppableContainer:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+    
+    def stop(self, **kwargs):
+        self.calls.append(("stop", kwargs))
+        if self.fail:
+            raise RuntimeError("daemon went away")
+    
+    def remove(self, **kwargs):
+        self.calls.append(("remove", kwargs))
+
+
+def test_stop_is_graceful_by_default(tmp_path):
+    runner = _runner(tmp_path)
+    container = runner.container = _StoppableContainer()
+    
+    runner.stop()
+    assert container.calls == [("stop", {"timeout": 10}), ("remove", {})]
+    assert runner.container is None
+
+
+def test_failed_stop_is_logged_without_a_forced_remove(tmp_path, caplog):
+    runner = _runner(tmp_path)
+    container = runner.container = _StoppableContainer(fail=True)
+    
+    runner.stop()
+    assert container.calls == [("stop", {"timeout": 10})]
+    assert "Error stopping container mcp-my-app" in caplog.text
@@ -0,0 +1,43 @@
+"""Tests for sharing LongTimeoutClient instances."""
+import asyncio
+
+import pytest
+
+from utils import long_timeout_client
+from utils.long_timeout_client import LongTimeoutClient
+
+URL = "http://localhost:8000/sse"
+
+
+@pytest.fixture(autouse=True)
+def client_cache(monkeypatch):
+    # get() is what's under test, not the connection setup
+    def init(self, url, timeout_seconds=1800):
+        self.url = url
+        self.timeout_seconds = timeout_seconds
+    
+    monkeypatch.setattr(LongTimeoutClient, "__init__", init)
+    cache = {}
+    monkeypatch.setattr(long_timeout_client, "_CLIENT_CACHE", cache)
+    return cache
+
+
+def test_get_shares_a_client_per_url_on_one_loop():
+    async def main():
+        return LongTimeoutClient.get(URL), LongTimeoutClient.get(URL), LongTimeoutClient.get(URL, 60)
+    
+    first, second, other_timeout = asyncio.run(main())
+    assert first is second
+    assert other_timeout is not first
+    assert other_timeout.timeout_seconds == 60
+
+
+def test_get_makes_a_client_per_loop_and_evicts_closed_loops(client_cache):
+    async def main():
+        return LongTimeoutClient.get(URL)
+    
+    first = asyncio.run(main())
+    second = asyncio.run(main())
+    assert second is not first
+    # The first loop was closed by asyncio.run, so only the second one's entry is left
+    assert [client for _, client in client_cache.values()] == [second]
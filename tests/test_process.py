@@ -0,0 +1,169 @@
+"""Tests for ApplicationRunner."""
+import os
+import socket
+
+import pytest
+
+from config.settings import ApplicationConfig, InterpreterType
+from utils.process import ApplicationRunner, _IOPump, _OutputStream, child_env
+
+ECHO_SERVER = """\
+import sys
+for line in sys.stdin:
+    print({prefix!r} + line.strip().upper(), flush=True)
+"""
+
+
+def _reusable_app(directory, prefix=""):
+    (directory / "serve.py").write_text(ECHO_SERVER.format(prefix=prefix))
+    return ApplicationConfig(
+        name="serve",
+        working_directory=str(directory),
+        interpreter_type=InterpreterType.PYTHON,
+        command="serve.py",
+        reusable=True,
+        timeout=10,
+    )
+
+
+def _script_app(directory, script, **options):
+    (directory / "app.py").write_text(script)
+    return ApplicationConfig(
+        name="app",
+        working_directory=str(directory),
+        interpreter_type=InterpreterType.PYTHON,
+        command="app.py",
+        **options,
+    )
+
+
+@pytest.fixture
+def runners():
+    started = []
+    yield started
+    for runner in started:
+        if runner.process:
+            runner.stop()
+
+
+def test_reusable_runners_share_process(tmp_path, runners):
+    config = _reusable_app(tmp_path)
+    first, second = ApplicationRunner(config), ApplicationRunner(config)
+    runners += [first, second]
+    
+    assert first.run() is second.run()
+    assert first.send_request("hello") == "HELLO"
+    assert second.send_request("again\n") == "AGAIN"
+
+
+def test_reusable_pool_is_keyed_on_working_directory(tmp_path, runners):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    a = ApplicationRunner(_reusable_app(tmp_path / "a", prefix="a:"))
+    b = ApplicationRunner(_reusable_app(tmp_path / "b", prefix="b:"))
+    runners += [a, b]
+    
+    assert a.run() is not b.run()
+    assert a.send_request("x") == "a:X"
+    assert b.send_request("x") == "b:X"
+
+
+def test_send_request_after_shared_process_stopped(tmp_path, runners):
+    config = _reusable_app(tmp_path)
+    first, second = ApplicationRunner(config), ApplicationRunner(config)
+    runners.append(second)
+    first.run()
+    second.run()
+    first.stop()
+    
+    with pytest.raises(RuntimeError):
+        second.send_request("hello")
+
+
+def test_send_request_requires_reusable_process(tmp_path):
+    runner = ApplicationRunner(_reusable_app(tmp_path))
+    
+    with pytest.raises(RuntimeError):
+        runner.send_request("hello")
+
+
+def test_child_env_inherits_when_nothing_is_added(monkeypatch):
+    monkeypatch.setenv("PYTHONUNBUFFERED", "0")
+    
+    assert child_env() is None
+    assert child_env({}, defaults={"PYTHONUNBUFFERED": "1"}) is None
+
+
+def test_child_env_uses_current_environment(monkeypatch):
+    monkeypatch.delenv("PYTHONUNBUFFERED", raising=False)
+    monkeypatch.setenv("WRAPPER_TEST_VAR", "now")
+    
+    env = child_env({"APP_VAR": "1"}, defaults={"PYTHONUNBUFFERED": "1", "WRAPPER_TEST_VAR": "default"})
+    assert env["WRAPPER_TEST_VAR"] == "now"
+    assert env["PYTHONUNBUFFERED"] == "1"
+    assert env["APP_VAR"] == "1"
+    assert child_env({"WRAPPER_TEST_VAR": "app"})["WRAPPER_TEST_VAR"] == "app"
+
+
+def _pump_pipe_through(pump, data=b"data"):
+    read_fd, write_fd = os.pipe()
+    stream = _OutputStream()
+    pump.register(os.fdopen(read_fd, "rb"), stream)
+    os.write(write_fd, data)
+    os.close(write_fd)
+    assert stream.wait_closed(5)
+    return stream.read(final=True)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="pipes cannot be selected on Windows")
+def test_pump_survives_read_errors():
+    pump = _IOPump()
+    peer, pipe = socket.socketpair()
+    # Closing a socket with unread data makes reads on the other end fail with ECONNRESET
+    pipe.sendall(b"unread")
+    peer.close()
+    stream = _OutputStream()
+    pump.register(pipe, stream)
+    
+    assert stream.wait_closed(5)
+    assert _pump_pipe_through(pump) == "data"
+
+
+@pytest.mark.skipif(os.name == "nt", reason="pipes cannot be selected on Windows")
+def test_pump_survives_unselectable_files(tmp_path):
+    pump = _IOPump()
+    (tmp_path / "file").write_bytes(b"")
+    stream = _OutputStream()
+    # Regular files cannot be registered with epoll
+    pump.register(open(tmp_path / "file", "rb"), stream)
+    
+    assert stream.wait_closed(5)
+    assert _pump_pipe_through(pump) == "data"
+
+
+@pytest.mark.skipif(os.name == "nt", reason="pipes cannot be selected on Windows")
+def test_pump_restarts_after_failure():
+    class FailingStream(_OutputStream):
+        def put(self, chunk):
+            if chunk:
+                raise RuntimeError("broken stream")
+            super().put(chunk)
+    
+    pump = _IOPump()
+    read_fd, write_fd = os.pipe()
+    stream = FailingStream()
+    pump.register(os.fdopen(read_fd, "rb"), stream)
+    os.write(write_fd, b"x")
+    assert stream.wait_closed(5)
+    os.close(write_fd)
+    
+    assert _pump_pipe_through(pump) == "data"
+
+
+@pytest.mark.parametrize("merge_stderr, output", [(False, ("out\n", "err\n")), (True, ("out\nerr\n", ""))])
+def test_merge_stderr(tmp_path, merge_stderr, output):
+    script = "import sys\nprint('out', flush=True)\nprint('err', file=sys.stderr)\n"
+    runner = ApplicationRunner(_script_app(tmp_path, script, merge_stderr=merge_stderr))
+    runner.run().wait()
+    
+    assert runner.stop() == output
@@ -0,0 +1,234 @@
+"""Tests for the MCP tools of AppConfigManager."""
+import asyncio
+import json
+import os
+import sys
+import time
+
+import pytest
+
+from app import server
+from app.server import AppConfigManager
+
+# Counts its runs in runs.txt, prints the count and exits with the code given as first argument
+COUNTER_APP = """\
+import sys
+with open("runs.txt", "a") as file:
+    file.write("x")
+with open("runs.txt") as file:
+    print(len(file.read()))
+sys.exit(int(sys.argv[1]))
+"""
+
+# Stands in for the venv's pip: logs its arguments and installs nothing
+FAKE_PIP = """\
+#!/bin/sh
+echo "$@" >> "$(dirname "$0")/../pip.log"
+# "broken" stands in for a requirement that can't be installed, alone or in a -r file
+for arg; do
+    if [ "${arg#broken}" != "$arg" ] || { [ -f "$arg" ] && grep -q "^broken" "$arg"; }; then
+        echo "No matching distribution found for broken" >&2
+        exit 1
+    fi
+done
+if [ "$1" = --version ]; then
+    echo "pip 24.0 from /site-packages/pip (python 3)"
+fi
+"""
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="the test venv is a POSIX layout")
+
+
+@pytest.fixture
+def app_dir(tmp_path):
+    app_dir = tmp_path / "app"
+    (app_dir / "venv" / "bin").mkdir(parents=True)
+    # A venv is found, so none is created
+    os.symlink(sys.executable, app_dir / "venv" / "bin" / "python")
+    pip = app_dir / "venv" / "bin" / "pip"
+    pip.write_text(FAKE_PIP)
+    pip.chmod(0o755)
+    (app_dir / "counter.py").write_text(COUNTER_APP)
+    return app_dir
+
+
+@pytest.fixture
+def make_manager(tmp_path, app_dir):
+    def make(**options):
+        lines = [
+            "applications:",
+            "  counter:",
+            "    name: Counter",
+            f"    working_directory: {app_dir}",
+            "    interpreter_type: python",
+            "    command: counter.py",
+        ]
+        lines += [f"    {key}: {json.dumps(value)}" for key, value in options.items()]
+        config_path = tmp_path / "config.yaml"
+        config_path.write_text("\n".join(lines) + "\n")
+        return AppConfigManager(str(config_path))
+    
+    return make
+
+
+def _pip_installs(app_dir):
+    try:
+        log = (app_dir / "venv" / "pip.log").read_text()
+    except FileNotFoundError:
+        return 0
+    return sum(line.startswith("install") for line in log.splitlines())
+
+
+def _execute(manager, *args):
+    """Run the counter app through the execute_application tool and return its result."""
+    from fastmcp import Client
+    
+    async def call():
+        async with Client(manager.mcp) as client:
+            result = await client.call_tool("execute_application", {"name": "counter", "args": list(args)})
+        # fastmcp 2 returns the content list, later versions a result object holding it
+        return json.loads(getattr(result, "content", result)[0].text)
+    
+    return asyncio.run(call())
+
+
+def test_pure_results_are_reused(make_manager):
+    manager = make_manager(pure=True)
+    
+    assert _execute(manager, "0")["stdout"] == "1\n"
+    assert _execute(manager, "0")["stdout"] == "1\n"
+    assert _execute(manager, "0", "other")["stdout"] == "2\n"
+
+
+def test_failed_pure_results_are_not_reused(make_manager):
+    manager = make_manager(pure=True)
+    
+    first = _execute(manager, "3")
+    assert first["exit_code"] == 3 and not first["success"]
+    assert _execute(manager, "3")["stdout"] == "2\n"
+
+
+def test_results_are_not_reused_without_pure(make_manager):
+    manager = make_manager()
+    
+    assert _execute(manager, "0")["stdout"] == "1\n"
+    assert _execute(manager, "0")["stdout"] == "2\n"
+
+
+def test_least_recently_used_result_is_evicted(make_manager, monkeypatch):
+    monkeypatch.setattr(server, "RESULT_CACHE_SIZE", 2)
+    manager = make_manager(pure=True)
+    
+    assert _execute(manager, "0", "a")["stdout"] == "1\n"
+    assert _execute(manager, "0", "b")["stdout"] == "2\n"
+    # A hit makes "a" the most recently used, so "c" evicts "b"
+    assert _execute(manager, "0", "a")["stdout"] == "1\n"
+    assert _execute(manager, "0", "c")["stdout"] == "3\n"
+    assert _execute(manager, "0", "a")["stdout"] == "1\n"
+    assert _execute(manager, "0", "b")["stdout"] == "4\n"
+
+
+def test_merge_stderr_captures_stderr_with_stdout(make_manager, app_dir):
+    (app_dir / "counter.py").write_text(
+        "import sys\nprint('out', flush=True)\nprint('err', file=sys.stderr)\nsys.exit(int(sys.argv[1]))\n"
+    )
+    
+    result = _execute(make_manager(merge_stderr=True), "0")
+    assert result["stdout"] == "out\nerr\n"
+    assert result["stderr"] == ""
+    
+    result = _execute(make_manager(), "0")
+    assert result["stdout"] == "out\n"
+    assert result["stderr"] == "err\n"
+
+
+def test_skip_site_starts_venv_python_without_site(make_manager, app_dir):
+    (app_dir / "counter.py").write_text("import sys\nprint(sys.flags.no_site)\nsys.exit(int(sys.argv[1]))\n")
+    
+    assert _execute(make_manager(skip_site=True), "0")["stdout"] == "1\n"
+    assert _execute(make_manager(), "0")["stdout"] == "0\n"
+
+
+def test_skip_site_with_requirements_is_reported(make_manager, app_dir, caplog):
+    (app_dir / "requirements.txt").write_text("something==1.0\n")
+    
+    make_manager(skip_site=True)
+    assert "sets skip_site but has a requirements.txt" in caplog.text
+
+
+def test_unchanged_requirements_are_not_installed_again(make_manager, app_dir):
+    (app_dir / "requirements.txt").write_text("# pinned\nsomething==1.0\n")
+    make_manager()
+    assert _pip_installs(app_dir) == 1
+    assert (app_dir / "venv" / server.REQUIREMENTS_HASH_FILE).exists()
+    
+    # Comments do not count as a change
+    (app_dir / "requirements.txt").write_text("something==1.0\n")
+    make_manager()
+    assert _pip_installs(app_dir) == 1
+    
+    (app_dir / "requirements.txt").write_text("something==2.0\n")
+    make_manager()
+    assert _pip_installs(app_dir) == 2
+
+
+def test_failed_requirements_are_retried_in_batches(make_manager, app_dir, monkeypatch, caplog):
+    monkeypatch.setattr(server, "PIP_BATCH_SIZE", 3)
+    requirements = ["pkg0==1.0", "broken==1.0", "pkg2==1.0", "pkg3==1.0", "pkg4==1.0"]
+    (app_dir / "requirements.txt").write_text("\n".join(requirements) + "\n")
+    
+    make_manager()
+    installs = [[arg for arg in line.split()[1:] if not arg.startswith("-")]
+                for line in (app_dir / "venv" / "pip.log").read_text().splitlines()
+                if line.startswith("install") and " -r " not in line]
+    # The batch holding the bad requirement is retried one by one, the other batch goes in whole
+    assert installs == [requirements[:3], ["pkg0==1.0"], ["broken==1.0"], ["pkg2==1.0"], requirements[3:]]
+    assert "Failed to install broken==1.0" in caplog.text
+    # A partial install is not recorded as done
+    assert not (app_dir / "venv" / server.REQUIREMENTS_HASH_FILE).exists()
+
+
+def test_output_beyond_max_output_bytes_is_truncated(make_manager, app_dir):
+    (app_dir / "counter.py").write_text("import sys\nsys.stdout.write('x' * 300000)\nsys.exit(int(sys.argv[1]))\n")
+    
+    result = _execute(make_manager(max_output_bytes=1000), "0")
+    assert result["stdout"] == "x" * 1000 + server.OUTPUT_TRUNCATED_MARKER.decode()
+    assert result["success"]
+
+
+def _process_gone(pid, timeout=5.0):
+    """Wait for a process to exit; a zombie nobody has reaped yet counts as gone."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with open(f"/proc/{pid}/stat") as file:
+                if file.read().rsplit(")", 1)[1].split()[0] == "Z":
+                    return True
+        except FileNotFoundError:
+            return True
+        except OSError:
+            # No procfs
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                return True
+        time.sleep(0.05)
+    return False
+
+
+def test_timeout_kills_the_whole_process_group(make_manager, app_dir):
+    (app_dir / "counter.py").write_text(
+        "import subprocess, sys, time\n"
+        "sleeper = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+        "with open('sleeper.pid', 'w') as file:\n"
+        "    file.write(str(sleeper.pid))\n"
+        "print('started', flush=True)\n"
+        "time.sleep(60)\n"
+    )
+    
+    result = _execute(make_manager(timeout=1), "0")
+    assert result["exit_code"] == 124
+    assert not result["success"]
+    assert result["stdout"] == "started\n"
+    assert "timed out after 1 seconds" in result["stderr"]
+    assert _process_gone(int((app_dir / "sleeper.pid").read_text()))
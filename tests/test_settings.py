@@ -0,0 +1,84 @@
+"""Tests for loading configs."""
+import os
+
+import pytest
+from pydantic import ValidationError
+
+from config.settings import ApplicationConfig, WrapperConfig, clear_config_cache, load_config
+
+CONFIG = """\
+applications:
+  echo_app:
+    name: Echo
+    working_directory: examples
+    interpreter_type: python
+    command: echo.py
+"""
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG)
+    clear_config_cache()
+    yield str(path)
+    clear_config_cache()
+
+
+def test_config_is_memoized_without_writing_files(config_path, monkeypatch):
+    config = load_config(config_path)
+    
+    def fail(*args, **kwargs):
+        raise AssertionError("config was parsed again")
+    monkeypatch.setattr(WrapperConfig, "model_validate", fail)
+    
+    assert load_config(config_path) is config
+    assert sorted(os.listdir(os.path.dirname(config_path))) == ["config.yaml"]
+
+
+def test_config_is_reloaded_when_the_file_changes(config_path):
+    load_config(config_path)
+    with open(config_path, "w") as file:
+        file.write(CONFIG.replace("name: Echo", "name: Echo 2"))
+    
+    assert load_config(config_path).applications["echo_app"].name == "Echo 2"
+
+
+@pytest.mark.parametrize("skip_site, prefix", [(False, []), (True, ["-S"])])
+def test_resolved_command_of_python_app(skip_site, prefix):
+    app_config = ApplicationConfig(
+        name="echo",
+        working_directory="examples",
+        interpreter_type="python",
+        interpreter_path="/usr/bin/python3",
+        command="echo.py",
+        args=["--uppercase"],
+        skip_site=skip_site,
+    )
+    
+    assert app_config.resolved_command == ("/usr/bin/python3", *prefix, "echo.py", "--uppercase")
+
+
+def test_skip_site_is_ignored_for_other_interpreters():
+    app_config = ApplicationConfig(
+        name="hello",
+        working_directory="examples",
+        interpreter_type="node",
+        interpreter_path="/usr/bin/node",
+        command="hello.js",
+        skip_site=True,
+    )
+    
+    assert app_config.resolved_command == ("/usr/bin/node", "hello.js")
+
+
+@pytest.mark.parametrize("max_output_bytes", [0, -1])
+def test_max_output_bytes_must_be_positive(max_output_bytes):
+    with pytest.raises(ValidationError):
+        ApplicationConfig(
+            name="echo",
+            working_directory="examples",
+            interpreter_type="python",
+            command="echo.py",
+            max_output_bytes=max_output_bytes,
+        )
@@ -3,22 +3,109 @@ import asyncio
 import sys
 import logging
 import argparse
+import io
 from typing import Dict, List, Optional
 import json
 import datetime
+import time
+from types import MappingProxyType
 
-# Import our custom client with improved timeout handling
+# orjson parses large tool results faster; its JSONDecodeError subclasses json.JSONDecodeError
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
+# Make our custom client (utils.long_timeout_client) importable
 import sys
 import os
 # Add the parent directory to sys.path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.long_timeout_client import LongTimeoutClient
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-async def get_server_tools(client, text, is_chinese, timeout):
+# ANSI styles used when printing the tools list
+_CYAN = "\033[1;36m"
+_YELLOW = "\033[0;33m"
+_RED = "\033[1;31m"
+_RESET = "\033[0m"
+_REQUIRED_MARK = f"{_RED}*{_RESET} "
+_TOOL_SEPARATOR = "\n\n" + "-" * 50 + "\n\n"
+
+def _block_writer():
+    """Return a function writing a text block to stdout.
+    
+    When stdout is a plain text wrapper whose newlines need no translation, blocks are
+    encoded once and written to its binary buffer, skipping the text layer; the text layer
+    is flushed first so the output stays in order. Otherwise sys.stdout.write is returned.
+    """
+    stdout = sys.stdout
+    buffer = getattr(stdout, 'buffer', None)
+    if type(stdout) is not io.TextIOWrapper or buffer is None or os.linesep != "\n":
+        return stdout.write
+    stdout.flush()
+    encoding, errors = stdout.encoding, stdout.errors
+    return lambda block: buffer.write(block.encode(encoding, errors))
+
+# Output text for each language
+_TEXT_EN = MappingProxyType({
+    "connecting": "Connecting to MCP server...",
+    "deployment_mode": "Deployment mode",
+    "app_list": "Application list",
+    "running": "available",
+    "not_running": "not available",
+    "help_info": "Getting help information for {}",
+    "help_success": "Help information",
+    "help_failed": "Failed to get help",
+    "exec_app": "Executing {} application",
+    "exec_result": "Execution result",
+    "exec_failed": "Execution failed",
+    "connection_error": "Error connecting to server",
+    "tools_list": "MCP Server Tools List",
+    "tool_name": "Tool Name",
+    "tool_description": "Description",
+    "tool_parameters": "Parameters",
+    "no_tools": "No tools found"
+})
+
+_TEXT_ZH = MappingProxyType({
+    "connecting": "正在连接 MCP 服务器...",
+    "deployment_mode": "部署模式",
+    "app_list": "应用列表",
+    "running": "可用",
+    "not_running": "不可用",
+    "help_info": "正在获取 {} 的帮助信息",
+    "help_success": "帮助信息",
+    "help_failed": "获取帮助失败",
+    "exec_app": "正在执行应用 {}",
+    "exec_result": "执行结果",
+    "exec_failed": "执行失败",
+    "connection_error": "连接服务器出错",
+    "tools_list": "MCP 服务器工具列表",
+    "tool_name": "工具名称",
+    "tool_description": "描述",
+    "tool_parameters": "参数",
+    "no_tools": "未找到工具"
+})
+
+def _render_params(params):
+    """Format the lines listing a tool's parameters from its JSON schema"""
+    lines = []
+    if isinstance(params, dict) and 'properties' in params:
+        required_params = frozenset(params.get('required', ()))
+        
+        for param_name, param_info in params['properties'].items():
+            get = param_info.get
+            
+            # Mark required parameters
+            required_mark = _REQUIRED_MARK if param_name in required_params else "  "
+            
+            lines.append(f"     {required_mark}{param_name} {_YELLOW}({get('type', 'unknown')}){_RESET}: {get('description', '')}")
+    return lines
+
+async def get_server_tools(client, text):
     """Get server tools list"""
     try:
         print(f"\n{text['tools_list']}:")
@@ -32,84 +119,61 @@ async def get_server_tools(client, text, is_chinese, timeout):
             else:
                 print(f"Found {len(tools)} tools\n")
                 
+                rendered_tools = []
                 for i, tool in enumerate(tools):
+                    # Collect each tool's lines; the whole listing is written in one go
+                    out = []
                     if hasattr(tool, 'name'):
                         # Standard tool object
                         tool_name = tool.name
                         tool_desc = getattr(tool, 'description', '')
-                        print(f"{i+1}. {text['tool_name']}: \033[1;36m{tool_name}\033[0m")
+                        out.append(f"{i+1}. {text['tool_name']}: {_CYAN}{tool_name}{_RESET}")
                         
                         if tool_desc:
                             # Handle multi-line descriptions
                             desc_lines = tool_desc.strip().split("\n")
                             if len(desc_lines) == 1:
-                                print(f"   {text['tool_description']}: {tool_desc}")
+                                out.append(f"   {text['tool_description']}: {tool_desc}")
                             else:
-                                print(f"   {text['tool_description']}:")
-                                for line in desc_lines:
-                                    print(f"     {line}")
+                                out.append(f"   {text['tool_description']}:\n     " + "\n     ".join(desc_lines))
                         
                         # Display parameters
                         if hasattr(tool, 'parameters') and tool.parameters:
                             params = tool.parameters
-                            print(f"   {text['tool_parameters']}:")
+                            out.append(f"   {text['tool_parameters']}:")
                             
                             # Try to parse parameters
                             try:
-                                if isinstance(params, dict) and 'properties' in params:
-                                    required_params = params.get('required', [])
-                                    
-                                    for param_name, param_info in params['properties'].items():
-                                        param_type = param_info.get('type', 'unknown')
-                                        param_desc = param_info.get('description', '')
-                                        
-                                        # Mark required parameters
-                                        is_required = param_name in required_params
-                                        required_mark = "\033[1;31m*\033[0m " if is_required else "  "
-                                        
-                                        print(f"     {required_mark}{param_name} \033[0;33m({param_type})\033[0m: {param_desc}")
+                                out.extend(_render_params(params))
                             except Exception as e:
                                 logger.warning(f"Failed to parse parameters for tool {tool_name}: {e}")
-                                print(f"     Raw parameters: {params}")
+                                out.append(f"     Raw parameters: {params}")
                     elif isinstance(tool, dict):
                         # Dictionary form of tool
                         tool_name = tool.get('name', 'Unknown')
                         tool_desc = tool.get('description', '')
-                        print(f"{i+1}. {text['tool_name']}: \033[1;36m{tool_name}\033[0m")
+                        out.append(f"{i+1}. {text['tool_name']}: {_CYAN}{tool_name}{_RESET}")
                         
                         if tool_desc:
                             # Handle multi-line descriptions
                             desc_lines = tool_desc.strip().split("\n")
                             if len(desc_lines) == 1:
-                                print(f"   {text['tool_description']}: {tool_desc}")
+                                out.append(f"   {text['tool_description']}: {tool_desc}")
                             else:
-                                print(f"   {text['tool_description']}:")
-                                for line in desc_lines:
-                                    print(f"     {line}")
+                                out.append(f"   {text['tool_description']}:\n     " + "\n     ".join(desc_lines))
                         
                         # Display parameters
                         if 'parameters' in tool:
                             params = tool['parameters']
-                            print(f"   {text['tool_parameters']}:")
-                            
-                            if isinstance(params, dict) and 'properties' in params:
-                                required_params = params.get('required', [])
-                                
-                                for param_name, param_info in params['properties'].items():
-                                    param_type = param_info.get('type', 'unknown')
-                                    param_desc = param_info.get('description', '')
-                                    
-                                    # Mark required parameters
-                                    is_required = param_name in required_params
-                                    required_mark = "\033[1;31m*\033[0m " if is_required else "  "
-                                    
-                                    print(f"     {required_mark}{param_name} \033[0;33m({param_type})\033[0m: {param_desc}")
+                            out.append(f"   {text['tool_parameters']}:")
+                            out.extend(_render_params(params))
                     else:
-                        print(f"{i+1}. {tool}")
+                        out.append(f"{i+1}. {tool}")
                     
-                    # If not the last tool, add a separator
-                    if i < len(tools) - 1:
-                        print("\n" + "-" * 50 + "\n")
+                    rendered_tools.append("\n".join(out))
+                
+                _block_writer()(_TOOL_SEPARATOR.join(rendered_tools) + "\n")
+                sys.stdout.flush()
         except Exception as e:
             logger.error(f"Failed to list tools: {e}")
             if 'tools' in locals():
@@ -117,10 +181,10 @@ async def get_server_tools(client, text, is_chinese, timeout):
     except Exception as e:
         logger.error(f"Failed to get tools list: {e}")
 
-async def get_deployment_mode(client, text, timeout):
+async def get_deployment_mode(client, text, deadline):
     """Get deployment mode"""
     try:
-        deployment_mode = await asyncio.wait_for(client.call_tool("get_deployment_mode"), timeout=timeout)
+        deployment_mode = await client.gate.call(client.call_tool("get_deployment_mode"), deadline)
         print(f"\n{text['deployment_mode']}: {deployment_mode}")
         return deployment_mode
     except asyncio.TimeoutError:
@@ -128,36 +192,62 @@ async def get_deployment_mode(client, text, timeout):
         print("Operation timed out")
         return None
 
-async def list_applications(client, text, timeout):
+def _apps_from_root(apps):
+    # Correct Pydantic model result
+    for app in apps.__root__:
+        yield app.name, bool(getattr(app, 'available', getattr(app, 'running', False)))
+
+def _apps_from_dict(apps):
+    # Dictionary form of result; support both attribute names
+    for app_name, app in apps.items():
+        yield app_name, bool(app.get('available', app.get('running', False)))
+
+def _apps_from_list(apps):
+    # List form of result; entries that are not dicts are shown as-is with an availability of None
+    for app in apps:
+        if isinstance(app, dict):
+            yield app.get('name', 'Unknown'), bool(app.get('available', app.get('running', False)))
+        else:
+            yield app, None
+
+_APPS_BY_TYPE = {'dict': _apps_from_dict, 'list': _apps_from_list}
+
+def _iter_apps(apps):
+    """Return an iterator of (name, available) pairs for a list_applications result, or None if its type is not handled"""
+    if hasattr(apps, "__root__"):
+        return _apps_from_root(apps)
+    handler = _APPS_BY_TYPE.get(type(apps).__name__)
+    if handler is None:
+        # Subclasses of dict or list
+        if isinstance(apps, dict):
+            handler = _apps_from_dict
+        elif isinstance(apps, list):
+            handler = _apps_from_list
+        else:
+            return None
+    return handler(apps)
+
+async def list_applications(client, text, deadline):
     """List applications"""
     try:
-        apps = await asyncio.wait_for(client.call_tool("list_applications"), timeout=timeout)
+        apps = await client.gate.call(client.call_tool("list_applications"), deadline)
         print(f"\n{text['app_list']}:")
         
-        # Ensure proper handling of return results
-        if hasattr(apps, "__root__"):
-            # Correct Pydantic model result
-            for app in apps.__root__:
-                app_available = getattr(app, 'available', getattr(app, 'running', False))
-                print(f"- {app.name}: {text['running'] if app_available else text['not_running']}")
-        elif isinstance(apps, dict):
-            # Dictionary form of result
-            for app_name, app in apps.items():
-                app_available = app.get('available', app.get('running', False))  # Support both attribute names
-                print(f"- {app_name}: {text['running'] if app_available else text['not_running']}")
-        elif isinstance(apps, list):
-            # List form of result
-            for app in apps:
-                if isinstance(app, dict):
-                    app_name = app.get('name', 'Unknown')
-                    app_available = app.get('available', app.get('running', False))
-                    print(f"- {app_name}: {text['running'] if app_available else text['not_running']}")
-                else:
-                    print(f"- {app}")
-        else:
+        # Normalize the result to (name, available) pairs and print them in one go
+        pairs = _iter_apps(apps)
+        if pairs is None:
             # Other cases
             print(f"Unexpected result type: {type(apps)}")
             print(f"Result: {apps}")
+        else:
+            out = []
+            for app_name, app_available in pairs:
+                if app_available is None:
+                    out.append(f"- {app_name}")
+                else:
+                    out.append(f"- {app_name}: {text['running'] if app_available else text['not_running']}")
+            if out:
+                print("\n".join(out))
         
         return apps
     except asyncio.TimeoutError:
@@ -165,63 +255,57 @@ async def list_applications(client, text, timeout):
         print("Operation timed out")
         return None
 
-async def get_application_help(client, text, app_name, timeout):
+def _unwrap_exec_result(result):
+    """Return (success, stdout, stderr) for an execution result.
+    
+    If the result cannot be interpreted, success is None and stderr holds the text to show instead.
+    """
+    if hasattr(result, 'stdout'):
+        # Standard object response
+        return result.success, result.stdout, result.stderr
+    if isinstance(result, dict):
+        # Dictionary response
+        return result.get('success', False), result.get('stdout', ''), result.get('stderr', '')
+    if isinstance(result, list):
+        # List response (usually a list of text content)
+        logger.warning("Received list instead of ApplicationExecutionResult object")
+        if not result:
+            return None, None, "Empty list result"
+        first_item = result[0]
+        if not hasattr(first_item, 'text'):
+            return None, None, f"Raw result: {result}"
+        # Try to parse text as JSON
+        try:
+            json_data = _loads(first_item.text)
+        except json.JSONDecodeError:
+            return None, None, f"Raw text: {first_item.text}"
+        if not isinstance(json_data, dict):
+            return None, None, f"Raw result: {json_data}"
+        return json_data.get('success', False), json_data.get('stdout', ''), json_data.get('stderr', '')
+    # Other type responses
+    return None, None, f"Unexpected result type: {type(result)}\nResult: {result}"
+
+async def get_application_help(client, text, app_name, deadline):
     """Get application help information"""
     try:
         print(f"\n{text['help_info'].format(app_name)}:")
-        help_result = await asyncio.wait_for(client.call_tool("get_application_help", {"name": app_name}), timeout=timeout)
+        help_result = await client.gate.call(client.call_tool("get_application_help", {"name": app_name}), deadline)
         
-        # Handle different types of responses
-        if hasattr(help_result, 'stdout'):
-            # Standard object response
-            if help_result.success:
-                print(f"{text['help_success']}:")
-                print(help_result.stdout)
-            else:
-                print(f"{text['help_failed']}: {help_result.stderr}")
-        elif isinstance(help_result, dict):
-            # Dictionary response
-            if help_result.get('success', False):
-                print(f"{text['help_success']}:")
-                print(help_result.get('stdout', ''))
-            else:
-                print(f"{text['help_failed']}: {help_result.get('stderr', '')}")
-        elif isinstance(help_result, list):
-            # List response (usually a list of text content)
-            logger.warning("Received list instead of ApplicationExecutionResult object")
-            
-            # Try to extract JSON from the list
-            if len(help_result) > 0:
-                first_item = help_result[0]
-                if hasattr(first_item, 'text'):
-                    # Try to parse text as JSON
-                    try:
-                        json_data = json.loads(first_item.text)
-                        if isinstance(json_data, dict):
-                            if json_data.get('success', False):
-                                print(f"{text['help_success']}:")
-                                print(json_data.get('stdout', ''))
-                            else:
-                                print(f"{text['help_failed']}: {json_data.get('stderr', '')}")
-                        else:
-                            print(f"Raw result: {json_data}")
-                    except json.JSONDecodeError:
-                        print(f"Raw text: {first_item.text}")
-                else:
-                    print(f"Raw result: {help_result}")
-            else:
-                print(f"Empty list result")
+        success, stdout, stderr = _unwrap_exec_result(help_result)
+        if success is None:
+            print(stderr)
+        elif success:
+            print(f"{text['help_success']}:")
+            print(stdout)
         else:
-            # Other type responses
-            print(f"Unexpected result type: {type(help_result)}")
-            print(f"Result: {help_result}")
+            print(f"{text['help_failed']}: {stderr}")
     except asyncio.TimeoutError:
         logger.error(f"Timeout getting help for {app_name}")
         print("Operation timed out")
     except Exception as e:
         logger.error(f"Failed to get help for '{app_name}': {e}")
 
-async def execute_application(client, text, app_name, args, timeout):
+async def execute_application(client, text, app_name, args):
     """Execute application"""
     try:
         # Directly use client.call_tool, without extra asyncio.wait_for wrapping
@@ -229,50 +313,14 @@ async def execute_application(client, text, app_name, args, timeout):
         print(f"\n{text['exec_app'].format(app_name)}:")
         exec_result = await client.call_tool("execute_application", {"name": app_name, "args": args})
         
-        # Handle different types of responses
-        if hasattr(exec_result, 'stdout'):
-            # Standard object response
-            if exec_result.success:
-                print(f"{text['exec_result']}:")
-                print(exec_result.stdout)
-            else:
-                print(f"{text['exec_failed']}: {exec_result.stderr}")
-        elif isinstance(exec_result, dict):
-            # Dictionary response
-            if exec_result.get('success', False):
-                print(f"{text['exec_result']}:")
-                print(exec_result.get('stdout', ''))
-            else:
-                print(f"{text['exec_failed']}: {exec_result.get('stderr', '')}")
-        elif isinstance(exec_result, list):
-            # List response (usually a list of text content)
-            logger.warning("Received list instead of ApplicationExecutionResult object")
-            
-            # Try to extract JSON from the list
-            if len(exec_result) > 0:
-                first_item = exec_result[0]
-                if hasattr(first_item, 'text'):
-                    # Try to parse text as JSON
-                    try:
-                        json_data = json.loads(first_item.text)
-                        if isinstance(json_data, dict):
-                            if json_data.get('success', False):
-                                print(f"{text['exec_result']}:")
-                                print(json_data.get('stdout', ''))
-                            else:
-                                print(f"{text['exec_failed']}: {json_data.get('stderr', '')}")
-                        else:
-                            print(f"Raw result: {json_data}")
-                    except json.JSONDecodeError:
-                        print(f"Raw text: {first_item.text}")
-                else:
-                    print(f"Raw result: {exec_result}")
-            else:
-                print(f"Empty list result")
+        success, stdout, stderr = _unwrap_exec_result(exec_result)
+        if success is None:
+            print(stderr)
+        elif success:
+            print(f"{text['exec_result']}:")
+            print(stdout)
         else:
-            # Other type responses
-            print(f"Unexpected result type: {type(exec_result)}")
-            print(f"Result: {exec_result}")
+            print(f"{text['exec_failed']}: {stderr}")
     except asyncio.TimeoutError:
         logger.error(f"Execution of {app_name} application timed out")
         print("Operation timed out")
@@ -287,57 +335,40 @@ async def test_mcp_client(server_url: str = "http://localhost:8000/sse", languag
         language: Output language, 'zh' for Chinese, 'en' for English
         timeout: Operation timeout in seconds
     """
-    # Set language
-    is_chinese = language.lower() == "zh"
-    
     # Language-related text
-    text = {
-        "connecting": "Connecting to MCP server...",
-        "deployment_mode": "Deployment mode",
-        "app_list": "Application list",
-        "running": "available",
-        "not_running": "not available",
-        "help_info": "Getting help information for {}",
-        "help_success": "Help information",
-        "help_failed": "Failed to get help",
-        "exec_app": "Executing {} application",
-        "exec_result": "Execution result",
-        "exec_failed": "Execution failed",
-        "connection_error": "Error connecting to server",
-        "tools_list": "MCP Server Tools List",
-        "tool_name": "Tool Name",
-        "tool_description": "Description",
-        "tool_parameters": "Parameters",
-        "no_tools": "No tools found"
-    }
+    text = _TEXT_ZH if language.lower() == "zh" else _TEXT_EN
     
     print(text["connecting"])
     print(f"Connection timeout: {timeout} seconds")
     
-    # Use our custom client with better timeout handling
-    client = LongTimeoutClient(server_url, timeout_seconds=timeout)
+    # Use our custom client with better timeout handling; imported here so --help does not load fastmcp
+    from utils.long_timeout_client import LongTimeoutClient
+    client = LongTimeoutClient.get(server_url, timeout_seconds=timeout)
+    
+    # One deadline shared by every call in the session
+    deadline = time.monotonic() + timeout
     
     try:
         # Use async context manager as required by FastMCP client
         async with client:
             # 1. Get server tools list
-            await get_server_tools(client, text, is_chinese, timeout)
+            await get_server_tools(client, text)
             
             # 2. Get deployment mode
-            await get_deployment_mode(client, text, timeout)
+            await get_deployment_mode(client, text, deadline)
             
             # 3. List applications
-            apps = await list_applications(client, text, timeout)
+            apps = await list_applications(client, text, deadline)
             
             # 4. Get invoice_app help information
-            await get_application_help(client, text, "hello_app", timeout)
+            await get_application_help(client, text, "hello_app", deadline)
             
             # 5. Execute invoice_app
             await execute_application(client, text, "hello_app", [
                 "-n", "hello Ben!",
                 "-l", "cn",
                 "-r", "3"
-            ], timeout)
+            ])
         
     except Exception as e:
         logger.error(f"{text['connection_error']}: {e}")
@@ -1,4 +1,10 @@
 # Utils package
-from .long_timeout_client import LongTimeoutClient
-
 __all__ = ['LongTimeoutClient']
+
+
+def __getattr__(name):
+    # LongTimeoutClient pulls in the fastmcp client, so it is only imported on first use
+    if name == 'LongTimeoutClient':
+        from .long_timeout_client import LongTimeoutClient
+        return LongTimeoutClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
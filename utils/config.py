@@ -3,7 +3,6 @@ Configuration utilities for the MCP Applications Wrapper.
 """
 
 import os
-import yaml
 from typing import Dict, List, Optional, Any, Union
 
 from config.settings import WrapperConfig, load_config
@@ -1,15 +1,54 @@
+import asyncio
+import codecs
+import json
 import os
 import logging
+import string
 import tempfile
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
 
-import docker
-from docker.errors import DockerException, ImageNotFound, BuildError
+# docker (and the requests/urllib3 stack under it) is imported on first use
 
 from config.settings import ApplicationConfig, DockerConfig
 
 logger = logging.getLogger(__name__)
 
+# Dockerfile layout; the dependency and ENV sections are empty or end with a newline
+_DOCKERFILE_TEMPLATE = (
+    "FROM {base_image}\n"
+    "WORKDIR /app\n"
+    "{deps}"
+    "COPY . .\n"
+    "{env}"
+    "CMD {cmd}\n"
+)
+_PYTHON_DEPS = "COPY requirements.txt .\nRUN pip install -r requirements.txt\n"
+_NODE_DEPS = "COPY package*.json .\nRUN npm install\n"
+
+# Lowercases ASCII letters and turns spaces into dashes for container and image names
+_SLUG_TABLE = str.maketrans({' ': '-', **{c: c.lower() for c in string.ascii_uppercase}})
+
+
+def _has_file(working_directory: str, filename: str) -> bool:
+    """Whether a dependency manifest exists in an application directory."""
+    return os.path.exists(os.path.join(working_directory, filename))
+
+
+@lru_cache(maxsize=1)
+def _docker_client_for(pid: int) -> "docker.DockerClient":
+    import docker
+    return docker.from_env()
+
+
+def _get_docker_client() -> "docker.DockerClient":
+    """Docker client shared by all runners in this process.
+    
+    The cache is keyed on the pid so a forked worker builds its own client instead
+    of reusing the parent's connection pool.
+    """
+    return _docker_client_for(os.getpid())
+
 
 class DockerRunner:
     """Utility for running applications in Docker containers."""
@@ -18,72 +57,67 @@ class DockerRunner:
         self.app_config = app_config
         self.docker_config = docker_config
         self.container = None
-        self.client = docker.from_env()
-        self.container_name = f"mcp-{self.app_config.name.lower().replace(' ', '-')}"
+        self.client = _get_docker_client()
+        self._slug = self.app_config.name.translate(_SLUG_TABLE)
+        self.container_name = f"mcp-{self._slug}"
     
     def _create_dockerfile(self) -> str:
         """Create a temporary Dockerfile for the application."""
+        # Install dependencies based on interpreter type
+        deps = ""
+        if self.app_config.interpreter_type == "python":
+            # If a requirements.txt exists in the app's working directory, copy and install it
+            if _has_file(self.app_config.working_directory, "requirements.txt"):
+                deps = _PYTHON_DEPS
+        elif self.app_config.interpreter_type == "node":
+            # If package.json exists in the app's working directory, copy and install dependencies
+            if _has_file(self.app_config.working_directory, "package.json"):
+                deps = _NODE_DEPS
+        
+        # Set environment variables
+        env = ""
+        if self.app_config.env_vars:
+            env = "".join(f"ENV {key}={value}\n" for key, value in self.app_config.env_vars.items())
+        
+        # Set the command to run the application
+        cmd_parts = []
+        
+        # Add the interpreter if needed
+        if self.app_config.interpreter_type == "python":
+            cmd_parts.append("python")
+        elif self.app_config.interpreter_type == "node":
+            cmd_parts.append("node")
+        elif self.app_config.interpreter_path:
+            cmd_parts.append(self.app_config.interpreter_path)
+        
+        # Add the main command
+        cmd_parts.append(self.app_config.command)
+        
+        # Add arguments if any
+        if self.app_config.args:
+            cmd_parts.extend(self.app_config.args)
+        
+        dockerfile = _DOCKERFILE_TEMPLATE.format_map({
+            "base_image": self.docker_config.base_image,
+            "deps": deps,
+            "env": env,
+            # Exec-form CMD is a JSON array, so json.dumps handles quotes and backslashes
+            "cmd": json.dumps(cmd_parts),
+        })
         with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.Dockerfile') as f:
-            # Start with the base image
-            f.write(f"FROM {self.docker_config.base_image}\n")
-            
-            # Set working directory
-            f.write(f"WORKDIR /app\n")
-            
-            # Install dependencies based on interpreter type
-            if self.app_config.interpreter_type == "python":
-                # If a requirements.txt exists in the app's working directory, copy and install it
-                requirements_path = os.path.join(self.app_config.working_directory, "requirements.txt")
-                if os.path.exists(requirements_path):
-                    f.write("COPY requirements.txt .\n")
-                    f.write("RUN pip install -r requirements.txt\n")
-            elif self.app_config.interpreter_type == "node":
-                # If package.json exists in the app's working directory, copy and install dependencies
-                package_path = os.path.join(self.app_config.working_directory, "package.json")
-                if os.path.exists(package_path):
-                    f.write("COPY package*.json .\n")
-                    f.write("RUN npm install\n")
-            
-            # Copy the application to the container
-            f.write("COPY . .\n")
-            
-            # Set environment variables
-            if self.app_config.env_vars:
-                for key, value in self.app_config.env_vars.items():
-                    f.write(f"ENV {key}={value}\n")
-            
-            # Set the command to run the application
-            cmd_parts = []
-            
-            # Add the interpreter if needed
-            if self.app_config.interpreter_type == "python":
-                cmd_parts.append("python")
-            elif self.app_config.interpreter_type == "node":
-                cmd_parts.append("node")
-            elif self.app_config.interpreter_path:
-                cmd_parts.append(self.app_config.interpreter_path)
-            
-            # Add the main command
-            cmd_parts.append(self.app_config.command)
-            
-            # Add arguments if any
-            if self.app_config.args:
-                cmd_parts.extend(self.app_config.args)
-            
-            # Format the command for the Dockerfile
-            cmd_str = ', '.join([f'"{part}"' for part in cmd_parts])
-            f.write(f"CMD [{cmd_str}]\n")
-            
+            f.write(dockerfile)
             return f.name
     
     def build_image(self) -> str:
         """Build a Docker image for the application."""
+        from docker.errors import DockerException, BuildError
+        
         try:
             # Create a Dockerfile
             dockerfile_path = self._create_dockerfile()
             
             # Image name
-            image_name = f"mcp-app-{self.app_config.name.lower().replace(' ', '-')}"
+            image_name = f"mcp-app-{self._slug}"
             
             logger.info(f"Building Docker image for {self.app_config.name}")
             
@@ -108,8 +142,14 @@ class DockerRunner:
             logger.error(f"Error building Docker image: {e}")
             raise
     
+    async def build_image_async(self) -> str:
+        """Build a Docker image for the application in a worker thread."""
+        return await asyncio.to_thread(self.build_image)
+    
     def run(self) -> str:
         """Run the application in a Docker container."""
+        from docker.errors import DockerException, ImageNotFound
+        
         try:
             # Build the image if needed
             image_name = self.build_image()
@@ -153,8 +193,21 @@ class DockerRunner:
             logger.error(f"Error running Docker container: {e}")
             raise
     
-    def stop(self) -> None:
-        """Stop the running Docker container."""
+    async def run_async(self) -> str:
+        """Run the application in a Docker container from a worker thread.
+        
+        The event loop is not blocked meanwhile, so several runners can be started
+        together with asyncio.gather().
+        """
+        return await asyncio.to_thread(self.run)
+    
+    def stop(self, graceful_stop: bool = True) -> None:
+        """Stop and remove the running Docker container.
+        
+        Args:
+            graceful_stop: Send SIGTERM and wait up to 10 seconds before removing the container;
+                if False, it is killed and removed in a single API call
+        """
         if not self.container:
             try:
                 # Try to find the container by name
@@ -165,16 +218,14 @@ class DockerRunner:
         
         try:
             logger.info(f"Stopping container {self.container_name}")
-            self.container.stop(timeout=10)  # Give it 10 seconds to stop gracefully
-            self.container.remove()  # Remove the container
+            if graceful_stop:
+                self.container.stop(timeout=10)  # Give it 10 seconds to stop gracefully
+                self.container.remove()  # Remove the container
+            else:
+                self.container.remove(force=True)  # Kill and remove in one call
             logger.info(f"Container {self.container_name} stopped and removed")
         except Exception as e:
-            logger.error(f"Error stopping container {self.container_name}: {e}")
-            # Try to force remove if stopping failed
-            try:
-                self.container.remove(force=True)
-            except:
-                pass
+            logger.error(f"Error stopping container {self.container_name}, it may have to be removed by hand: {e}")
         finally:
             self.container = None
     
@@ -193,17 +244,32 @@ class DockerRunner:
         except:
             return False
     
-    def get_logs(self) -> str:
-        """Get the logs from the container."""
+    def iter_logs(self) -> Iterator[str]:
+        """Yield the container's logs as decoded text chunks.
+        
+        The logs are streamed from the daemon rather than read into memory at once, so
+        callers doing line-oriented work should prefer this over get_logs().
+        """
         if not self.container:
             try:
                 # Try to find the container by name
                 self.container = self.client.containers.get(self.container_name)
             except:
-                return ""
+                return
         
         try:
-            return self.container.logs().decode('utf-8')
+            # A chunk may end in the middle of a multi-byte character
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            for chunk in self.container.logs(stream=True, follow=False, stdout=True, stderr=True):
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            text = decoder.decode(b'', final=True)
+            if text:
+                yield text
         except Exception as e:
             logger.error(f"Error getting logs for container {self.container_name}: {e}")
-            return ""
+    
+    def get_logs(self) -> str:
+        """Get the logs from the container."""
+        return "".join(self.iter_logs())
@@ -1,13 +1,67 @@
+import asyncio
 import datetime
 import logging
-from typing import Dict, List, Optional, Any
+import threading
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
 
 # Import the official FastMCP client
 from fastmcp.client.client import Client as FastMCPClient
-from fastmcp.client.transports import SSETransport, infer_transport
 
 logger = logging.getLogger(__name__)
 
+# Clients shared by LongTimeoutClient.get(), keyed on (url, timeout_seconds, id(loop)).
+# The loop is stored with the client so a recycled id of a dead loop is not mistaken for it.
+_CLIENT_CACHE: Dict[Tuple[str, int, int], Tuple[asyncio.AbstractEventLoop, "LongTimeoutClient"]] = {}
+_CLIENT_CACHE_LOCK = threading.Lock()
+
+
+class TimeoutGate:
+    """Admits calls while fewer than ``limit`` are in flight and the deadline has not passed."""
+
+    def __init__(self, limit: int = 1):
+        self._cond = asyncio.Condition(asyncio.Lock())
+        self._active = 0
+        self.limit = limit
+
+    def _admissible(self) -> bool:
+        return self._active < self.limit
+
+    async def resize(self, limit: int) -> None:
+        """Change the number of calls allowed in flight at once."""
+        async with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+    async def call(self, coro: Awaitable[Any], deadline: float) -> Any:
+        """Await ``coro`` once admitted, raising asyncio.TimeoutError if ``deadline`` (time.monotonic()) passes first.
+
+        The deadline bounds both the wait for a slot and the call itself.
+        """
+        try:
+            async with self._cond:
+                # A timer is only armed when the call actually has to wait for a slot
+                if not self._admissible():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    await asyncio.wait_for(self._cond.wait_for(self._admissible), remaining)
+                if time.monotonic() >= deadline:
+                    raise asyncio.TimeoutError()
+                self._active += 1
+        except BaseException:
+            # The coroutine will never be awaited; close it to avoid a "never awaited" warning
+            if asyncio.iscoroutine(coro):
+                coro.close()
+            raise
+        try:
+            return await asyncio.wait_for(coro, deadline - time.monotonic())
+        finally:
+            async with self._cond:
+                self._active -= 1
+                self._cond.notify(1)
+
+
 class LongTimeoutClient(FastMCPClient):
     """A FastMCP client with improved timeout handling for long-running operations."""
     
@@ -24,6 +78,8 @@ class LongTimeoutClient(FastMCPClient):
             timeout_seconds: Timeout in seconds for read operations
             **kwargs: Additional arguments to pass to FastMCPClient
         """
+        from fastmcp.client.transports import SSETransport, infer_transport
+        
         # Convert seconds to timedelta for read_timeout_seconds
         read_timeout = datetime.timedelta(seconds=timeout_seconds)
         
@@ -50,4 +106,27 @@ class LongTimeoutClient(FastMCPClient):
             **kwargs
         )
         
-        logger.info(f"Initialized LongTimeoutClient with read_timeout_seconds={timeout_seconds}s") 
\ No newline at end of file
+        # Admission gate for calls sharing one session deadline
+        self.gate = TimeoutGate()
+        
+        logger.info(f"Initialized LongTimeoutClient with read_timeout_seconds={timeout_seconds}s") 
+    
+    @classmethod
+    def get(cls, url: str, timeout_seconds: int = 1800) -> "LongTimeoutClient":
+        """Return a client for ``url`` shared by callers on the running event loop.
+        
+        The client's transport and gate hold asyncio primitives bound to the loop they were
+        first used on, so each loop gets its own client. Entries for closed loops are evicted.
+        Must be called from a coroutine.
+        """
+        loop = asyncio.get_running_loop()
+        key = (url, timeout_seconds, id(loop))
+        with _CLIENT_CACHE_LOCK:
+            for stale in [k for k, (l, _) in _CLIENT_CACHE.items() if l.is_closed()]:
+                del _CLIENT_CACHE[stale]
+            entry = _CLIENT_CACHE.get(key)
+            if entry is not None and entry[0] is loop:
+                return entry[1]
+            client = cls(url, timeout_seconds=timeout_seconds)
+            _CLIENT_CACHE[key] = (loop, client)
+            return client
@@ -1,96 +1,373 @@
+import codecs
+import io
 import os
+import queue
+import selectors
+import signal
 import subprocess
-import sys
-from typing import Dict, List, Optional, Tuple, Union
+import threading
+import time
+from functools import cached_property
+from typing import IO, Dict, List, Optional, Tuple, Union
 import logging
 
 from config.settings import ApplicationConfig, InterpreterType
 
 logger = logging.getLogger(__name__)
 
+# Applications run in their own process group so a timeout can kill everything they started
+if os.name == 'nt':
+    PROCESS_GROUP_KWARGS = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    PROCESS_GROUP_KWARGS = {"start_new_session": True}
+
+
+def child_env(env_vars: Optional[Dict[str, str]] = None,
+              defaults: Optional[Dict[str, str]] = None) -> Optional[Dict[str, str]]:
+    """Environment to start a child process with: os.environ as it is now, plus env_vars.
+    
+    ``defaults`` are only used for variables os.environ does not set. Returns None when
+    there is nothing to add, so the child inherits os.environ without it being copied.
+    """
+    if not env_vars and not (defaults and not defaults.keys() <= os.environ.keys()):
+        return None
+    return {**(defaults or {}), **os.environ, **(env_vars or {})}
+
+
+def _drain_queue(q: "queue.Queue[bytes]") -> bytes:
+    """Return everything currently in the queue without blocking."""
+    chunks = []
+    while True:
+        try:
+            chunks.append(q.get_nowait())
+        except queue.Empty:
+            break
+    return b"".join(chunks)
+
+
+class _OutputStream:
+    """Output received from one of a child's pipes.
+    
+    Chunks are decoded as UTF-8 (invalid bytes replaced, newlines normalized) only when
+    the output is asked for, with an incremental decoder so characters split between
+    chunks come out whole.
+    """
+    
+    def __init__(self):
+        self._queue: "queue.Queue[bytes]" = queue.Queue()
+        self._decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')('replace'), translate=True)
+        # Decoded text held back by readline()
+        self._pending = ""
+        self._eof = threading.Event()
+    
+    def put(self, chunk: bytes) -> None:
+        """Add a chunk read from the pipe; an empty chunk marks EOF."""
+        if not chunk:
+            self._eof.set()
+        # The EOF marker is queued too, to wake up a waiting readline()
+        self._queue.put(chunk)
+    
+    def read(self, final: bool = False) -> str:
+        """Return the output received so far without blocking."""
+        text = self._pending + self._decoder.decode(_drain_queue(self._queue), final)
+        self._pending = ""
+        return text
+    
+    def readline(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Wait for one line of output and return it without its newline; None at EOF.
+        
+        Raises queue.Empty if no full line arrives within ``timeout`` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while "\n" not in self._pending:
+            # read() may already have taken the EOF marker off the queue
+            if self._eof.is_set() and self._queue.empty():
+                return None
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            chunk = self._queue.get(timeout=remaining)
+            if not chunk:
+                return None
+            self._pending += self._decoder.decode(chunk)
+        line, self._pending = self._pending.split("\n", 1)
+        return line
+    
+    def wait_closed(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the pipe has reached EOF; False if it is still open after ``timeout`` seconds."""
+        return self._eof.wait(timeout)
+
+
+class _IOPump:
+    """Copies the output of all running applications from their pipes into their streams.
+    
+    One selector on one background thread serves every pipe, so a running application
+    costs no thread of its own. Only the pump thread touches the selector; other threads
+    queue their changes and wake it up through a pipe of its own.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (pipe, stream) to add, (pipe, None) to remove
+        self._changes: List[Tuple[IO[bytes], Optional[_OutputStream]]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup_r = self._wakeup_w = -1
+    
+    def register(self, pipe: IO[bytes], stream: _OutputStream) -> None:
+        """Copy the pipe into the stream until EOF, then close the pipe."""
+        os.set_blocking(pipe.fileno(), False)
+        self._change(pipe, stream)
+    
+    def unregister(self, pipe: IO[bytes]) -> None:
+        """Stop copying a pipe that has not reached EOF, close it and end its stream."""
+        self._change(pipe, None)
+    
+    def _change(self, pipe: IO[bytes], stream: Optional[_OutputStream]) -> None:
+        with self._lock:
+            self._changes.append((pipe, stream))
+            if self._thread is None or not self._thread.is_alive():
+                self._start()
+        try:
+            os.write(self._wakeup_w, b"\0")
+        except BlockingIOError:
+            # Plenty of wakeups pending already
+            pass
+    
+    def _start(self) -> None:
+        """Start the pump thread; called with the lock held."""
+        if self._wakeup_r < 0:
+            self._wakeup_r, self._wakeup_w = os.pipe()
+            os.set_blocking(self._wakeup_r, False)
+            os.set_blocking(self._wakeup_w, False)
+        self._thread = threading.Thread(target=self._run, name="io-pump", daemon=True)
+        self._thread.start()
+    
+    def _run(self) -> None:
+        selector = selectors.DefaultSelector()
+        try:
+            selector.register(self._wakeup_r, selectors.EVENT_READ)
+            while True:
+                woken = False
+                for key, _ in selector.select():
+                    if key.fd == self._wakeup_r:
+                        woken = True
+                        continue
+                    try:
+                        chunk = os.read(key.fd, 65536)
+                    except BlockingIOError:
+                        continue
+                    except OSError as e:
+                        # Only this pipe is lost; treat it as closed
+                        logger.warning("Error reading application output: %s", e)
+                        chunk = b''
+                    if chunk:
+                        key.data.put(chunk)
+                    else:
+                        self._close(selector, key.fileobj, key.data)
+                # Applied after the events, which may still refer to pipes about to be closed
+                if woken:
+                    self._apply_changes(selector)
+        except Exception:
+            logger.exception("Application output pump failed")
+        finally:
+            # Nobody reads the remaining pipes any more; end their streams so no one waits on them
+            for key in list(selector.get_map().values()):
+                if key.fd != self._wakeup_r:
+                    self._close(selector, key.fileobj, key.data)
+            selector.close()
+            with self._lock:
+                self._thread = None
+                # Changes queued meanwhile would never be applied otherwise
+                if self._changes:
+                    self._start()
+    
+    def _apply_changes(self, selector: selectors.BaseSelector) -> None:
+        try:
+            while os.read(self._wakeup_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            changes, self._changes = self._changes, []
+        for pipe, stream in changes:
+            if stream is not None:
+                try:
+                    selector.register(pipe, selectors.EVENT_READ, stream)
+                except (OSError, ValueError) as e:
+                    logger.warning("Cannot read application output: %s", e)
+                    self._close(None, pipe, stream)
+                continue
+            try:
+                key = selector.get_key(pipe)
+            except (KeyError, ValueError):
+                # Reached EOF and was closed already
+                continue
+            self._close(selector, pipe, key.data)
+    
+    @staticmethod
+    def _close(selector: Optional[selectors.BaseSelector], pipe: IO[bytes], stream: _OutputStream) -> None:
+        """Stop reading a pipe, close it and mark its stream EOF."""
+        try:
+            if selector is not None:
+                selector.unregister(pipe)
+            pipe.close()
+        except (KeyError, OSError, ValueError):
+            pass
+        stream.put(b'')
+
+
+# Pipes cannot be selected on Windows, where each one gets a _pump_pipe() thread instead
+_IO_PUMP = _IOPump()
+
+
+def _pump_pipe(pipe: IO[bytes], stream: _OutputStream) -> None:
+    """Copy chunks from one pipe into its stream until EOF (pipes cannot be selected on Windows)."""
+    # read1() returns whatever the pipe has, so output is passed on as soon as it arrives
+    for chunk in iter(lambda: pipe.read1(65536), b''):
+        stream.put(chunk)
+    stream.put(b'')
+    pipe.close()
+
 
 class ApplicationRunner:
     """Utility for running applications as subprocesses."""
     
+    # Live processes of reusable applications, shared by all runners and keyed on
+    # (command line, working directory, env_vars): (process, stdout, stderr)
+    _pool: Dict[Tuple, Tuple[subprocess.Popen, _OutputStream, _OutputStream]] = {}
+    _pool_lock = threading.Lock()
+    
     def __init__(self, app_config: ApplicationConfig):
         self.config = app_config
         self.process = None
+        self._stdout = None
+        self._stderr = None
         
+    @cached_property
+    def interpreter_command(self) -> str:
+        """The interpreter command based on the configuration, resolved once per runner."""
+        return self.config.resolve_interpreter()
+    
+    @property
+    def command_line(self) -> Tuple[str, ...]:
+        """The command to run the application, resolved once per configuration."""
+        return self.config.resolved_command
+    
+    @property
+    def _env(self) -> Optional[Dict[str, str]]:
+        """Environment for the child; None to inherit ours unchanged."""
+        # A Python child block-buffers stdout into a pipe, so get_output() would see nothing
+        # until it wrote a few KiB or exited; the environment and env_vars can override this
+        if self.config.interpreter_type == InterpreterType.PYTHON:
+            return child_env(self.config.env_vars, defaults={"PYTHONUNBUFFERED": "1"})
+        return child_env(self.config.env_vars)
+    
     def get_interpreter_command(self) -> str:
         """Get the interpreter command based on the configuration."""
-        if self.config.interpreter_path:
-            return self.config.interpreter_path
-        
-        if self.config.interpreter_type == InterpreterType.PYTHON:
-            return sys.executable  # Use the current Python interpreter
-        elif self.config.interpreter_type == InterpreterType.NODE:
-            return "node"  # Assume node is in the PATH
-        else:
-            raise ValueError(f"Unsupported interpreter type: {self.config.interpreter_type}")
+        return self.interpreter_command
     
     def build_command(self) -> List[str]:
         """Build the command to run the application."""
-        cmd = []
-        
-        # Add the interpreter if needed
-        if self.config.interpreter_type != InterpreterType.CUSTOM:
-            cmd.append(self.get_interpreter_command())
-        
-        # Add the main command
-        cmd.append(self.config.command)
-        
-        # Add arguments if any
-        if self.config.args:
-            cmd.extend(self.config.args)
-            
-        return cmd
+        return list(self.command_line)
     
     def run(self) -> subprocess.Popen:
-        """Run the application as a subprocess."""
-        cmd = self.build_command()
-        env = os.environ.copy()
+        """Run the application as a subprocess.
         
-        # Add environment variables if specified
-        if self.config.env_vars:
-            env.update(self.config.env_vars)
+        For a reusable application a process started earlier for the same command line,
+        working directory and environment is returned if it is still alive, so requests can be fed to it with
+        send_request() instead of starting the interpreter again.
+        """
+        cmd = self.command_line
+        if not self.config.reusable:
+            return self._spawn(cmd)
         
-        logger.info(f"Starting application {self.config.name} with command: {' '.join(cmd)}")
+        key = (
+            cmd,
+            self.config.working_directory,
+            tuple(sorted(self.config.env_vars.items())) if self.config.env_vars else (),
+        )
+        with self._pool_lock:
+            entry = self._pool.get(key)
+            if entry is not None and entry[0].poll() is None:
+                logger.info("Reusing running process %s for application %s", entry[0].pid, self.config.name)
+                self.process, self._stdout, self._stderr = entry
+                return self.process
+            self._spawn(cmd)
+            self._pool[key] = (self.process, self._stdout, self._stderr)
+            return self.process
+    
+    def _spawn(self, cmd: Tuple[str, ...]) -> subprocess.Popen:
+        """Start a new process for the application and its output readers."""
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Starting application %s with command: %s", self.config.name, ' '.join(cmd))
         
+        # Keep this call vfork-friendly so spawning does not get slower as the server's memory
+        # grows: no preexec_fn, user or group changes (start_new_session instead)
         self.process = subprocess.Popen(
             cmd,
             cwd=self.config.working_directory,
-            env=env,
+            env=self._env,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1  # Line buffered
+            # A merged stderr goes into the stdout pipe, leaving one pipe to read
+            stderr=subprocess.STDOUT if self.config.merge_stderr else subprocess.PIPE,
+            # Reusable applications read their requests from stdin
+            stdin=subprocess.PIPE if self.config.reusable else None,
+            bufsize=65536,
+            **PROCESS_GROUP_KWARGS
         )
         
+        # Read both pipes in the background so the child never blocks on a full pipe
+        # and get_output() can poll without blocking
+        self._stdout = _OutputStream()
+        self._stderr = _OutputStream()
+        pipes = [(self.process.stdout, self._stdout)]
+        if self.process.stderr is not None:
+            pipes.append((self.process.stderr, self._stderr))
+        else:
+            self._stderr.put(b'')
+        for pipe, stream in pipes:
+            if os.name == 'nt':
+                threading.Thread(target=_pump_pipe, args=(pipe, stream), daemon=True).start()
+            else:
+                _IO_PUMP.register(pipe, stream)
+        
         return self.process
     
     def stop(self) -> Optional[Tuple[str, str]]:
         """Stop the running application."""
         if not self.process:
-            logger.warning(f"Application {self.config.name} is not running")
+            logger.warning("Application %s is not running", self.config.name)
             return None
         
-        logger.info(f"Stopping application {self.config.name}")
+        logger.info("Stopping application %s", self.config.name)
+        
+        if self.config.reusable:
+            with self._pool_lock:
+                for key, entry in list(self._pool.items()):
+                    if entry[0] is self.process:
+                        del self._pool[key]
         
         try:
-            # Try to terminate gracefully first
-            self.process.terminate()
-            try:
-                # Wait for up to 5 seconds for the process to terminate
-                stdout, stderr = self.process.communicate(timeout=5)
-                return stdout, stderr
-            except subprocess.TimeoutExpired:
-                # If it doesn't terminate in time, kill it
-                logger.warning(f"Application {self.config.name} did not terminate gracefully, killing it")
-                self.process.kill()
-                stdout, stderr = self.process.communicate()
-                return stdout, stderr
+            # Only signal and wait if the application has not exited on its own
+            if self.process.poll() is None:
+                # Try to terminate gracefully first
+                self._signal_group()
+                try:
+                    # Wait for up to 5 seconds for the process to terminate
+                    self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    # If it doesn't terminate in time, kill it
+                    logger.warning("Application %s did not terminate gracefully, killing it", self.config.name)
+                    self._signal_group(force=True)
+                    self.process.wait()
+            # The output is complete once the pipes reach EOF; a leftover grandchild holding
+            # them open must not hang stop(), so the wait is bounded
+            deadline = time.monotonic() + 5
+            for pipe, stream in ((self.process.stdout, self._stdout), (self.process.stderr, self._stderr)):
+                if not stream.wait_closed(max(0.0, deadline - time.monotonic())) and os.name != 'nt':
+                    _IO_PUMP.unregister(pipe)
+            # Return what get_output() has not picked up yet
+            return self._stdout.read(final=True), self._stderr.read(final=True)
         except Exception as e:
-            logger.error(f"Error stopping application {self.config.name}: {e}")
+            logger.error("Error stopping application %s: %s", self.config.name, e)
             # Ensure the process is killed in case of an error
             try:
                 self.process.kill()
@@ -100,6 +377,51 @@ class ApplicationRunner:
         finally:
             self.process = None
     
+    def _signal_group(self, force: bool = False) -> None:
+        """Terminate, or with ``force`` kill, the application's process group, which includes anything it started."""
+        if os.name == 'nt':
+            # No process group signals; both end up in TerminateProcess for the application itself
+            if force:
+                self.process.kill()
+            else:
+                self.process.terminate()
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL if force else signal.SIGTERM)
+        except ProcessLookupError:
+            # The whole group has exited already
+            pass
+    
+    def send_request(self, line: str, timeout: Optional[float] = None) -> str:
+        """Send one request line to a reusable application and return its one-line reply.
+        
+        Args:
+            line: Request to write to the application's stdin; a newline is added if missing
+            timeout: Seconds to wait for the reply, defaults to the application's timeout
+            
+        Returns:
+            The reply line without its trailing newline
+        """
+        if not self.process or self.process.stdin is None:
+            raise RuntimeError(f"Application {self.config.name} is not running as a reusable process")
+        
+        if not line.endswith("\n"):
+            line += "\n"
+        try:
+            self.process.stdin.write(line.encode())
+            self.process.stdin.flush()
+        except (OSError, ValueError):
+            # The process is gone, e.g. stopped through another runner sharing it
+            raise RuntimeError(f"Application {self.config.name} exited before replying")
+        
+        try:
+            reply = self._stdout.readline(timeout if timeout is not None else self.config.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"Application {self.config.name} did not reply in time")
+        if reply is None:
+            raise RuntimeError(f"Application {self.config.name} exited before replying")
+        return reply
+    
     def is_running(self) -> bool:
         """Check if the application is running."""
         if not self.process:
@@ -113,29 +435,4 @@ class ApplicationRunner:
             return "", ""
         
         # Get output without blocking, might not be complete
-        stdout_data = ""
-        stderr_data = ""
-        
-        # Read from stdout if available
-        if self.process.stdout and self.process.stdout.readable():
-            try:
-                while True:
-                    line = self.process.stdout.readline()
-                    if not line:
-                        break
-                    stdout_data += line
-            except:
-                pass
-        
-        # Read from stderr if available
-        if self.process.stderr and self.process.stderr.readable():
-            try:
-                while True:
-                    line = self.process.stderr.readline()
-                    if not line:
-                        break
-                    stderr_data += line
-            except:
-                pass
-        
-        return stdout_data, stderr_data
+        return self._stdout.read(), self._stderr.read()